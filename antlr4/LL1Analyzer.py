@@ -9,7 +9,7 @@ from antlr4.PredictionContext import PredictionContext, SingletonPredictionConte
 from antlr4.RuleContext import RuleContext
 from antlr4.atn.ATN import ATN
 from antlr4.atn.ATNConfig import ATNConfig
-from antlr4.atn.ATNState import ATNState, RuleStopState
+from antlr4.atn.ATNState import ATNState, RuleStopState, StarLoopEntryState
 from antlr4.atn.Transition import WildcardTransition, NotSetTransition, AbstractPredicateTransition, RuleTransition
 
 
@@ -39,19 +39,58 @@ class LL1Analyzer (object):
             return None
 
         count = len(s.transitions)
-        look = [] * count
+        look = [None] * count
         for alt in range(0, count):
-            look[alt] = set()
+            look[alt] = IntervalSet()
             lookBusy = set()
             seeThruPreds = False # fail to get lookahead upon pred
-            self._LOOK(s.transition(alt).target, None, PredictionContext.EMPTY,
+            self._LOOK(s.transitions[alt].target, None, PredictionContext.EMPTY,
                   look[alt], lookBusy, set(), seeThruPreds, False)
             # Wipe out lookahead for this alternative if we found nothing
             # or we had a predicate when we !seeThruPreds
-            if len(look[alt])==0 or self.HIT_PRED in look[alt]:
+            if not look[alt].intervals or self.HIT_PRED in look[alt]:
                 look[alt] = None
         return look
 
+    #*
+    # Computes an LL(1) prediction table for the decision state {@code s}:
+    # a list indexed by token type (with {@link Token#EOF} in the last
+    # element) whose entry is the alternative predicted by that token, if
+    # exactly one alternative can start with it, and
+    # {@link ATN#INVALID_ALT_NUMBER} otherwise.
+    #
+    # <p>The lookahead of an alternative that can reach the end of its rule
+    # includes every token that can follow the rule anywhere in the grammar,
+    # so a token that appears in a single alternative's lookahead predicts
+    # that alternative in every context. Decisions involving predicates,
+    # including precedence decisions, have no table.</p>
+    #
+    # @param s the decision state
+    # @return the prediction table, or {@code null} if no token predicts
+    # a unique alternative
+    #/
+    def getDecisionTable(self, s:ATNState):
+        if isinstance(s, StarLoopEntryState) and s.isPrecedenceDecision:
+            return None
+        look = self.getDecisionLookahead(s)
+        if look is None or None in look:
+            return None
+
+        table = [ATN.INVALID_ALT_NUMBER] * (self.atn.maxTokenType + 2)
+        ambiguous = set()
+        for alt, tokens in enumerate(look, 1):
+            for t in tokens:
+                if t < Token.EOF or t > self.atn.maxTokenType:
+                    return None
+                if table[t] != ATN.INVALID_ALT_NUMBER:
+                    ambiguous.add(t)
+                table[t] = alt
+        for t in ambiguous:
+            table[t] = ATN.INVALID_ALT_NUMBER
+        if not any(table):
+            return None
+        return table
+
     #*
     # Compute set of tokens that can follow {@code s} in the ATN in the
     # specified {@code ctx}.
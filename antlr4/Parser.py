@@ -566,6 +566,30 @@ class Parser (Recognizer):
     def getSourceName(self):
         return self._input.sourceName
 
+    # Installs a {@link ProfilingATNSimulator} to record statistics about
+    #  each decision's predictions, or removes it. The statistics are available
+    #  from {@link #getParseInfo} while profiling.
+    #
+    def setProfile(self, profile:bool):
+        from antlr4.atn.ParserATNSimulator import ParserATNSimulator
+        from antlr4.atn.ProfilingATNSimulator import ProfilingATNSimulator
+        interp = self._interp
+        if profile:
+            if not isinstance(interp, ProfilingATNSimulator):
+                self._interp = ProfilingATNSimulator(self)
+        elif isinstance(interp, ProfilingATNSimulator):
+            self._interp = ParserATNSimulator(self, interp.atn, interp.decisionToDFA, interp.sharedContextCache)
+        self._interp.predictionMode = interp.predictionMode
+
+    # The per-decision {@link DecisionInfo} of the profiling simulator, or
+    #  {@code null} if the parser is not profiling.
+    #
+    def getParseInfo(self):
+        from antlr4.atn.ProfilingATNSimulator import ProfilingATNSimulator
+        if isinstance(self._interp, ProfilingATNSimulator):
+            return self._interp.getDecisionInfo()
+        return None
+
     # During a parse is sometimes useful to listen in on the rule entry and exit
     #  events as well as token matches. self is for quick and dirty debugging.
     #
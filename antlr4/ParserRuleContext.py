@@ -34,7 +34,7 @@ from antlr4.tree.Tree import ParseTreeListener, ParseTree, TerminalNodeImpl, Err
 ParserRuleContext = None
 
 class ParserRuleContext(RuleContext):
-    __slots__ = ('children', 'start', 'stop', 'exception')
+    __slots__ = ('children', 'start', 'stop', 'exception', 'childIndex')
     def __init__(self, parent:ParserRuleContext = None, invokingStateNumber:int = None ):
         super().__init__(parent, invokingStateNumber)
         #* If we are debugging or building a parse tree for a visitor,
@@ -49,6 +49,10 @@ class ParserRuleContext(RuleContext):
         # The exception that forced this rule to return. If the rule successfully
         # completed, this is {@code null}.
         self.exception = None
+        # The children of each rule context class and token type looked up by
+        # the typed accessors, built on first lookup and discarded whenever the
+        # children change.
+        self.childIndex = None
 
     #* COPY a ctx (I'm deliberately not using copy constructor)#/
     #
@@ -65,6 +69,7 @@ class ParserRuleContext(RuleContext):
         self.parentCtx = ctx.parentCtx
         self.invokingState = ctx.invokingState
         self.children = None
+        self.childIndex = None
         self.start = ctx.start
         self.stop = ctx.stop
 
@@ -89,6 +94,7 @@ class ParserRuleContext(RuleContext):
         if self.children is None:
             self.children = []
         self.children.append(child)
+        self.childIndex = None
         return child
 
     #* Used by enterOuterAlt to toss out a RuleContext previously added as
@@ -98,6 +104,7 @@ class ParserRuleContext(RuleContext):
     def removeLastChild(self):
         if self.children is not None:
             del self.children[len(self.children)-1]
+            self.childIndex = None
 
     def addTokenNode(self, token:Token):
         node = TerminalNodeImpl(token)
@@ -115,13 +122,8 @@ class ParserRuleContext(RuleContext):
         if ttype is None:
             return self.children[i] if len(self.children)>i else None
         else:
-            for child in self.getChildren():
-                if not isinstance(child, ttype):
-                    continue
-                if i==0:
-                    return child
-                i -= 1
-            return None
+            children = self.getIndexedChildren(ttype)
+            return children[i] if 0 <= i < len(children) else None
 
     def getChildren(self, predicate = None):
         if self.children is not None:
@@ -130,42 +132,40 @@ class ParserRuleContext(RuleContext):
                     continue
                 yield child
 
+    # Get the children that are instances of a rule context class, or
+    #  terminals of a token type, in order. The list is indexed by class or
+    #  type, so that repeated calls from the generated accessors, e.g.
+    #  {@code expr(0)} and {@code expr(1)}, don't each scan the children.
+    #  The caller must not modify it.
+    #/
+    def getIndexedChildren(self, key):
+        index = self.childIndex
+        if index is None:
+            index = self.childIndex = dict()
+        children = index.get(key)
+        if children is None:
+            if self.children is None:
+                children = []
+            elif isinstance(key, int):
+                children = [child for child in self.children
+                            if isinstance(child, TerminalNode) and child.symbol.type == key]
+            else:
+                children = [child for child in self.children if isinstance(child, key)]
+            index[key] = children
+        return children
+
     def getToken(self, ttype:int, i:int):
-        for child in self.getChildren():
-            if not isinstance(child, TerminalNode):
-                continue
-            if child.symbol.type != ttype:
-                continue
-            if i==0:
-                return child
-            i -= 1
-        return None
+        tokens = self.getIndexedChildren(ttype)
+        return tokens[i] if 0 <= i < len(tokens) else None
 
     def getTokens(self, ttype:int ):
-        if self.getChildren() is None:
-            return []
-        tokens = []
-        for child in self.getChildren():
-            if not isinstance(child, TerminalNode):
-                continue
-            if child.symbol.type != ttype:
-                continue
-            tokens.append(child)
-        return tokens
+        return list(self.getIndexedChildren(ttype))
 
     def getTypedRuleContext(self, ctxType:type, i:int):
         return self.getChild(i, ctxType)
 
     def getTypedRuleContexts(self, ctxType:type):
-        children = self.getChildren()
-        if children is None:
-            return []
-        contexts = []
-        for child in children:
-            if not isinstance(child, ctxType):
-                continue
-            contexts.append(child)
-        return contexts
+        return list(self.getIndexedChildren(ctxType))
 
     def getChildCount(self):
         return len(self.children) if self.children else 0
@@ -3,7 +3,10 @@
 # Use of this file is governed by the BSD 3-clause license that
 # can be found in the LICENSE.txt file in the project root.
 #/
+from collections import OrderedDict
 from io import StringIO
+import sys
+import threading
 
 from antlr4.error.Errors import IllegalStateException
 
@@ -77,14 +80,37 @@ def calculateListsHashCode(parents:[], returnStates:[] ):
         h = hash((h, calculateHashCode(parent, returnState)))
     return h
 
+# The approximate memory used by a single context node, not including its parents.
+def approximateSize(ctx:PredictionContext):
+    size = sys.getsizeof(ctx) + sys.getsizeof(ctx.__dict__)
+    if isinstance(ctx, ArrayPredictionContext):
+        size += sys.getsizeof(ctx.parents) + sys.getsizeof(ctx.returnStates)
+    return size
+
 #  Used to cache {@link PredictionContext} objects. Its used for the shared
 #  context cash associated with contexts in DFA states. This cache
 #  can be used for both lexers and parsers.
 
 class PredictionContextCache(object):
 
-    def __init__(self):
-        self.cache = dict()
+    # @param maxSize the maximum number of contexts to retain, or {@code null}
+    # for no limit. When the limit is exceeded, the least recently used
+    # context is evicted. Eviction is always safe: the cache only serves to
+    # share equal contexts, and an evicted context remains valid wherever it
+    # is already referenced.
+    #
+    def __init__(self, maxSize:int=None):
+        self.cache = OrderedDict()
+        self.maxSize = maxSize
+        # counters: lookups that found a cached context, contexts added,
+        # contexts evicted, and the approximate size in bytes of the contexts
+        # currently cached
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.approximateBytes = 0
+        # the cache is shared by all parsers of a grammar, in any thread
+        self.lock = threading.Lock()
 
     #  Add a context to the cache and return it. If the context already exists,
     #  return that one instead and do not add a new context to the cache.
@@ -93,14 +119,39 @@ class PredictionContextCache(object):
     def add(self, ctx:PredictionContext):
         if ctx==PredictionContext.EMPTY:
             return PredictionContext.EMPTY
+        with self.lock:
+            existing = self._lookup(ctx)
+            if existing is not None:
+                return existing
+            self.misses += 1
+            self.cache[ctx] = ctx
+            self.approximateBytes += approximateSize(ctx)
+            if self.maxSize is not None:
+                while len(self.cache) > self.maxSize:
+                    _, evicted = self.cache.popitem(last=False)
+                    self.approximateBytes -= approximateSize(evicted)
+                    self.evictions += 1
+            return ctx
+
+    def get(self, ctx:PredictionContext):
+        with self.lock:
+            return self._lookup(ctx)
+
+    def _lookup(self, ctx:PredictionContext):
         existing = self.cache.get(ctx, None)
         if existing is not None:
-            return existing
-        self.cache[ctx] = ctx
-        return ctx
+            self.hits += 1
+            if self.maxSize is not None:
+                self.cache.move_to_end(ctx)
+        return existing
 
-    def get(self, ctx:PredictionContext):
-        return self.cache.get(ctx, None)
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.approximateBytes = 0
 
     def __len__(self):
         return len(self.cache)
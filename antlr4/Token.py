@@ -107,6 +107,8 @@ class CommonToken(Token):
         t.text = self.text
         return t
 
+    # The text is sliced from the input on first use, and kept; the input
+    # is never modified once tokens have been created from it.
     @property
     def text(self):
         if self._text is not None:
@@ -116,7 +118,8 @@ class CommonToken(Token):
             return None
         n = input.size
         if self.start < n and self.stop < n:
-            return input.getText(self.start, self.stop)
+            self._text = input.getText(self.start, self.stop)
+            return self._text
         else:
             return "<EOF>"
 
@@ -0,0 +1,182 @@
+#
+# Copyright (c) 2012-2017 The ANTLR Project. All rights reserved.
+# Use of this file is governed by the BSD 3-clause license that
+# can be found in the LICENSE.txt file in the project root.
+#
+
+# A {@link TokenStream} that keeps only a sliding window of the tokens fetched
+# from its {@link TokenSource}, rather than every token, so that a file of any
+# size can be parsed in bounded memory (provided the parse tree, if built, is
+# not retained).
+#
+# <p>The window always holds {@link #LT LT(1)} and whatever lookahead has been
+# fetched beyond it. Tokens behind {@code LT(1)} are discarded as soon as no
+# {@link #mark} is outstanding; adaptive prediction marks the stream while it
+# looks ahead, so the window grows only to the lookahead of the current
+# decision. Tokens outside the window can't be reached with {@link #get},
+# {@link #seek} or {@link #getText}.</p>
+#
+# <p>Like {@link BufferedTokenStream}, this stream ignores token channels.</p>
+from io import StringIO
+from antlr4.BufferedTokenStream import TokenStream
+from antlr4.Token import Token
+from antlr4.error.Errors import IllegalStateException
+
+# need forward declaration
+Lexer = None
+
+
+class UnbufferedTokenStream(TokenStream):
+    __slots__ = ('tokenSource', 'tokens', 'p', 'numMarkers', 'lastToken',
+                 'lastTokenBufferStart', 'currentTokenIndex')
+
+    def __init__(self, tokenSource:Lexer):
+        self.tokenSource = tokenSource
+        # The window of tokens: {@code tokens[p]} is {@code LT(1)}. Tokens
+        # before {@code p} are kept only while a mark is outstanding.
+        self.tokens = []
+        self.p = 0
+        # The number of {@link #mark} calls without a matching {@link #release}.
+        self.numMarkers = 0
+        # The token before {@code LT(1)}, for {@code LT(-1)}, and the token
+        # before the first token in the window, for {@code LT(-1)} after a seek
+        # to the start of the window.
+        self.lastToken = None
+        self.lastTokenBufferStart = None
+        # The absolute index of {@code LT(1)} in the whole token stream.
+        self.currentTokenIndex = 0
+        self.fill(1)
+
+    @property
+    def index(self):
+        return self.currentTokenIndex
+
+    def getBufferStartIndex(self):
+        return self.currentTokenIndex - self.p
+
+    def get(self, i:int):
+        bufferStartIndex = self.getBufferStartIndex()
+        if i < bufferStartIndex or i >= bufferStartIndex + len(self.tokens):
+            raise IndexError("get(" + str(i) + ") outside buffer: " + str(bufferStartIndex) + ".." +
+                             str(bufferStartIndex + len(self.tokens)))
+        return self.tokens[i - bufferStartIndex]
+
+    def LT(self, i:int):
+        if i == -1:
+            return self.lastToken
+        self.sync(i)
+        index = self.p + i - 1
+        if index < 0:
+            raise IndexError("LT(" + str(i) + ") gives negative index")
+        if index >= len(self.tokens):
+            # the last token in the window is EOF
+            return self.tokens[-1]
+        return self.tokens[index]
+
+    def LA(self, i:int):
+        return self.LT(i).type
+
+    def consume(self):
+        if self.LA(1) == Token.EOF:
+            raise IllegalStateException("cannot consume EOF")
+        self.lastToken = self.tokens[self.p]
+        # at the last token in the window with no marks, empty the window
+        if self.p == len(self.tokens) - 1 and self.numMarkers == 0:
+            self.tokens.clear()
+            self.p = -1 # p += 1 will leave this at 0
+            self.lastTokenBufferStart = self.lastToken
+        self.p += 1
+        self.currentTokenIndex += 1
+        self.sync(1)
+
+    # Make sure we have {@code want} tokens from the current position
+    # {@link #p} in the window.
+    def sync(self, want:int):
+        need = (self.p + want - 1) - len(self.tokens) + 1
+        if need > 0:
+            self.fill(need)
+
+    # Add {@code n} tokens to the window, stopping after EOF. Returns the
+    # number of tokens added.
+    def fill(self, n:int):
+        tokens = self.tokens
+        for i in range(0, n):
+            if len(tokens) > 0 and tokens[-1].type == Token.EOF:
+                return i
+            t = self.tokenSource.nextToken()
+            t.tokenIndex = self.getBufferStartIndex() + len(tokens)
+            tokens.append(t)
+        return n
+
+    # Return a marker that keeps the tokens from {@code LT(1)} onward in the
+    # window until it is released. Marks must be released in reverse order.
+    def mark(self):
+        if self.numMarkers == 0:
+            self.lastTokenBufferStart = self.lastToken
+        mark = -self.numMarkers - 1
+        self.numMarkers += 1
+        return mark
+
+    def release(self, marker:int):
+        expectedMark = -self.numMarkers
+        if marker != expectedMark:
+            raise IllegalStateException("release() called with an invalid marker.")
+        self.numMarkers -= 1
+        if self.numMarkers == 0:
+            # discard the tokens behind LT(1)
+            if self.p > 0:
+                del self.tokens[:self.p]
+                self.p = 0
+            self.lastTokenBufferStart = self.lastToken
+
+    def reset(self):
+        self.seek(0)
+
+    def seek(self, index:int):
+        if index == self.currentTokenIndex:
+            return
+        if index > self.currentTokenIndex:
+            self.sync(index - self.currentTokenIndex)
+            index = min(index, self.getBufferStartIndex() + len(self.tokens) - 1)
+        bufferStartIndex = self.getBufferStartIndex()
+        i = index - bufferStartIndex
+        if i < 0:
+            raise IndexError("cannot seek to negative index " + str(index))
+        if i >= len(self.tokens):
+            raise IndexError("seek to index outside buffer: " + str(index) + " not in " +
+                             str(bufferStartIndex) + ".." + str(bufferStartIndex + len(self.tokens)))
+        self.p = i
+        self.currentTokenIndex = index
+        if self.p == 0:
+            self.lastToken = self.lastTokenBufferStart
+        else:
+            self.lastToken = self.tokens[self.p - 1]
+
+    @property
+    def size(self):
+        raise IllegalStateException("Unbuffered stream cannot know its size")
+
+    def getSourceName(self):
+        return self.tokenSource.getSourceName()
+
+    def getText(self, start:int=None, stop:int=None):
+        bufferStartIndex = self.getBufferStartIndex()
+        bufferStopIndex = bufferStartIndex + len(self.tokens) - 1
+        if isinstance(start, Token):
+            start = start.tokenIndex
+        elif start is None:
+            start = bufferStartIndex
+        if isinstance(stop, Token):
+            stop = stop.tokenIndex
+        elif stop is None:
+            stop = bufferStopIndex
+        if start < bufferStartIndex or stop > bufferStopIndex:
+            raise IndexError("interval " + str(start) + ".." + str(stop) + " not in token buffer window: " +
+                             str(bufferStartIndex) + ".." + str(bufferStopIndex))
+        with StringIO() as buf:
+            for i in range(start - bufferStartIndex, stop - bufferStartIndex + 1):
+                t = self.tokens[i]
+                if t.type == Token.EOF:
+                    break
+                buf.write(t.text)
+            return buf.getvalue()
@@ -4,6 +4,7 @@ from antlr4.FileStream import FileStream
 from antlr4.StdinStream import StdinStream
 from antlr4.BufferedTokenStream import TokenStream
 from antlr4.CommonTokenStream import CommonTokenStream
+from antlr4.UnbufferedTokenStream import UnbufferedTokenStream
 from antlr4.Lexer import Lexer
 from antlr4.Parser import Parser
 from antlr4.dfa.DFA import DFA
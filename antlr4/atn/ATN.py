@@ -15,7 +15,7 @@ class ATN(object):
     __slots__ = (
         'grammarType', 'maxTokenType', 'states', 'decisionToState',
         'ruleToStartState', 'ruleToStopState', 'modeNameToStartState',
-        'ruleToTokenType', 'lexerActions', 'modeToStartState'
+        'ruleToTokenType', 'lexerActions', 'modeToStartState', 'll1Tables'
     )
 
     INVALID_ALT_NUMBER = 0
@@ -46,6 +46,10 @@ class ATN(object):
         # be referenced by action transitions in the ATN.
         self.lexerActions = None
         self.modeToStartState = []
+        # For parser ATNs, the LL(1) prediction table of each decision, or
+        # null where a decision is not LL(1); computed on first use by
+        # {@link ParserATNSimulator}.
+        self.ll1Tables = None
 
     # Compute the set of valid tokens that can occur starting in state {@code s}.
     #  If {@code ctx} is null, the set of tokens will not include what can follow
@@ -23,7 +23,7 @@ ATNConfig = None
 class ATNConfig(object):
     __slots__ = (
         'state', 'alt', 'context', 'semanticContext', 'reachesIntoOuterContext',
-        'precedenceFilterSuppressed'
+        'precedenceFilterSuppressed', 'cachedConfigSetKey'
     )
 
     def __init__(self, state:ATNState=None, alt:int=None, context:PredictionContext=None, semantic:SemanticContext=None, config:ATNConfig=None):
@@ -58,6 +58,7 @@ class ATNConfig(object):
         # accurate depth since I don't ever decrement. TODO: make it a boolean then
         self.reachesIntoOuterContext = 0 if config is None else config.reachesIntoOuterContext
         self.precedenceFilterSuppressed = False if config is None else config.precedenceFilterSuppressed
+        self.cachedConfigSetKey = None
 
     # An ATN configuration is equal to another if both have
     #  the same state, they predict the same alternative, and
@@ -79,7 +80,25 @@ class ATNConfig(object):
         return hash((self.state.stateNumber, self.alt, self.context, self.semanticContext))
 
     def hashCodeForConfigSet(self):
-        return hash((self.state.stateNumber, self.alt, hash(self.semanticContext)))
+        return hash(self.configSetKey())
+
+    # The key identifying this configuration within an {@link ATNConfigSet}:
+    # two configurations with equal keys are merged by the set. For parser
+    # configurations that is {@code (state, alt, semanticContext)}, ignoring
+    # the prediction context. None of these change once the configuration is
+    # created, so the key is computed once. Since almost all configurations
+    # have no semantic context, it is left out of the key in that case; the
+    # key is then a pair of ints, which hashes without calling back into
+    # Python code.
+    def configSetKey(self):
+        key = self.cachedConfigSetKey
+        if key is None:
+            if self.semanticContext is SemanticContext.NONE:
+                key = (self.state.stateNumber, self.alt)
+            else:
+                key = (self.state.stateNumber, self.alt, self.semanticContext)
+            self.cachedConfigSetKey = key
+        return key
 
     def equalsForConfigSet(self, other):
         if self is other:
@@ -154,6 +173,13 @@ class LexerATNConfig(ATNConfig):
 
 
 
+    # Lexer configurations are only merged when fully equal, so a lexer
+    # configuration is its own key.
+    def configSetKey(self):
+        return self
+
+
+
     def checkNonGreedyDecision(self, source:LexerATNConfig, target:ATNState):
         return source.passedThroughNonGreedyDecision \
             or isinstance(target, DecisionState) and target.nonGreedy
@@ -34,8 +34,9 @@ class ATNConfigSet(object):
     # use a hash table that lets us specify the equals/hashcode operation.
 
     def __init__(self, fullCtx:bool=True):
-        # All configs but hashed by (s, i, _, pi) not including context. Wiped out
-        # when we go readonly as this set becomes a DFA state.
+        # All configs keyed by ATNConfig.configSetKey(), i.e. (s, i, pi) not
+        # including context. Wiped out when we go readonly as this set becomes
+        # a DFA state.
         self.configLookup = dict()
         # Indicates that this configuration set is part of a full context
         #  LL prediction. It will be used to determine how to merge $. With SLL
@@ -100,18 +101,7 @@ class ATNConfigSet(object):
         return True
 
     def getOrAdd(self, config:ATNConfig):
-        h = config.hashCodeForConfigSet()
-        l = self.configLookup.get(h, None)
-        if l is not None:
-            r = next((cfg for cfg in l if config.equalsForConfigSet(cfg)), None)
-            if r is not None:
-                return r
-        if l is None:
-            l = [config]
-            self.configLookup[h] = l
-        else:
-            l.append(config)
-        return config
+        return self.configLookup.setdefault(config.configSetKey(), config)
 
     def getStates(self):
         return set(c.state for c in self.configs)
@@ -170,13 +160,7 @@ class ATNConfigSet(object):
     def __contains__(self, config):
         if self.configLookup is None:
             raise UnsupportedOperationException("This method is not implemented for readonly sets.")
-        h = config.hashCodeForConfigSet()
-        l = self.configLookup.get(h, None)
-        if l is not None:
-            for c in l:
-                if config.equalsForConfigSet(c):
-                    return True
-        return False
+        return config.configSetKey() in self.configLookup
 
     def clear(self):
         if self.readonly:
@@ -30,6 +30,7 @@ from antlr4.atn.ATNConfigSet import ATNConfigSet, OrderedATNConfigSet
 from antlr4.atn.ATNState import RuleStopState, ATNState
 from antlr4.atn.LexerActionExecutor import LexerActionExecutor
 from antlr4.atn.Transition import Transition
+from antlr4.dfa.DFA import DFA
 from antlr4.dfa.DFAState import DFAState
 from antlr4.error.Errors import LexerNoViableAltException, UnsupportedOperationException
 
@@ -52,14 +53,22 @@ LexerATNSimulator = None
 class LexerATNSimulator(ATNSimulator):
     __slots__ = (
         'decisionToDFA', 'recog', 'startIndex', 'line', 'column', 'mode',
-        'DEFAULT_MODE', 'MAX_CHAR_VALUE', 'prevAccept'
+        'DEFAULT_MODE', 'MAX_CHAR_VALUE', 'prevAccept', 'dfa'
     )
 
     debug = False
     dfa_debug = False
 
     MIN_DFA_EDGE = 0
-    MAX_DFA_EDGE = 127 # forces unicode to stay in ATN
+    MAX_DFA_EDGE = 127 # edges above this are kept in DFAState.sparseEdges
+    # the most sparse (non-ASCII) edges cached per DFA state, e.g. for a
+    # string or comment loop over arbitrary text; beyond it, unseen code
+    # points are matched by ATN simulation.
+    MAX_SPARSE_EDGES = 4096
+
+    # the maximum number of states in any one mode's DFA, or None for no
+    # limit; see discardDFA
+    maxDFAStates = None
 
     ERROR = None
 
@@ -83,6 +92,10 @@ class LexerATNSimulator(ATNSimulator):
         self.MAX_CHAR_VALUE = Lexer.MAX_CHAR_VALUE
         # Used during DFA/ATN exec to record the most recent accept configuration info
         self.prevAccept = SimState()
+        # The DFA of the current match: the mode's DFA when the match began,
+        #  even if it has since been discarded. Every state the match reaches
+        #  belongs to it, so its lock guards their edges.
+        self.dfa = None
 
 
     def copyState(self, simulator:LexerATNSimulator ):
@@ -98,6 +111,7 @@ class LexerATNSimulator(ATNSimulator):
             self.startIndex = input.index
             self.prevAccept.reset()
             dfa = self.decisionToDFA[mode]
+            self.dfa = dfa
             if dfa.s0 is None:
                 return self.matchATN(input)
             else:
@@ -118,19 +132,18 @@ class LexerATNSimulator(ATNSimulator):
         if LexerATNSimulator.debug:
             print("matchATN mode " + str(self.mode) + " start: " + str(startState))
 
-        old_mode = self.mode
         s0_closure = self.computeStartState(input, startState)
         suppressEdge = s0_closure.hasSemanticContext
         s0_closure.hasSemanticContext = False
 
         next = self.addDFAState(s0_closure)
         if not suppressEdge:
-            self.decisionToDFA[self.mode].s0 = next
+            self.dfa.s0 = next
 
         predict = self.execATN(input, next)
 
         if LexerATNSimulator.debug:
-            print("DFA after matchATN: " + str(self.decisionToDFA[old_mode].toLexerString()))
+            print("DFA after matchATN: " + str(self.dfa.toLexerString()))
 
         return predict
 
@@ -204,10 +217,14 @@ class LexerATNSimulator(ATNSimulator):
     # {@code t}, or {@code null} if the target state for this edge is not
     # already cached
     def getExistingTargetState(self, s:DFAState, t:int):
-        if s.edges is None or t < self.MIN_DFA_EDGE or t > self.MAX_DFA_EDGE:
+        if t > self.MAX_DFA_EDGE:
+            if s.sparseEdges is None:
+                return None
+            target = s.sparseEdges.get(t)
+        elif s.edges is None or t < self.MIN_DFA_EDGE:
             return None
-
-        target = s.edges[t - self.MIN_DFA_EDGE]
+        else:
+            target = s.edges[t - self.MIN_DFA_EDGE]
         if LexerATNSimulator.debug and target is not None:
             print("reuse state", str(s.stateNumber), "edge to", str(target.stateNumber))
 
@@ -498,18 +515,26 @@ class LexerATNSimulator(ATNSimulator):
                 return to
 
         # add the edge
-        if tk < self.MIN_DFA_EDGE or tk > self.MAX_DFA_EDGE:
+        if tk < self.MIN_DFA_EDGE:
             # Only track edges within the DFA bounds
             return to
 
         if LexerATNSimulator.debug:
             print("EDGE " + str(from_) + " -> " + str(to) + " upon "+ chr(tk))
 
-        if from_.edges is None:
-            #  make room for tokens 1..n and -1 masquerading as index 0
-            from_.edges = [ None ] * (self.MAX_DFA_EDGE - self.MIN_DFA_EDGE + 1)
+        with self.dfa.lock:
+            if tk > self.MAX_DFA_EDGE:
+                if from_.sparseEdges is None:
+                    from_.sparseEdges = dict()
+                if len(from_.sparseEdges) < self.MAX_SPARSE_EDGES:
+                    from_.sparseEdges[tk] = to # connect
+                return to
+
+            if from_.edges is None:
+                #  make room for tokens 1..n and -1 masquerading as index 0
+                from_.edges = [ None ] * (self.MAX_DFA_EDGE - self.MIN_DFA_EDGE + 1)
 
-        from_.edges[tk - self.MIN_DFA_EDGE] = to # connect
+            from_.edges[tk - self.MIN_DFA_EDGE] = to # connect
 
         return to
 
@@ -528,22 +553,41 @@ class LexerATNSimulator(ATNSimulator):
             proposed.lexerActionExecutor = firstConfigWithRuleStopState.lexerActionExecutor
             proposed.prediction = self.atn.ruleToTokenType[firstConfigWithRuleStopState.state.ruleIndex]
 
-        dfa = self.decisionToDFA[self.mode]
+        dfa = self.dfa
         existing = dfa.states.get(proposed, None)
         if existing is not None:
             return existing
 
         newState = proposed
 
-        newState.stateNumber = len(dfa.states)
         configs.setReadonly(True)
         newState.configs = configs
-        dfa.states[newState] = newState
+        with dfa.lock:
+            # another thread may have added an equivalent state meanwhile
+            existing = dfa.states.get(proposed, None)
+            if existing is not None:
+                return existing
+            newState.stateNumber = len(dfa.states)
+            dfa.states[newState] = newState
+        if self.maxDFAStates is not None and len(dfa.states) > self.maxDFAStates:
+            self.discardDFA(dfa)
         return newState
 
     def getDFA(self, mode:int):
         return self.decisionToDFA[mode]
 
+    # Replaces the DFA of every mode with an empty one; see discardDFA.
+    def clearDFA(self):
+        for mode in range(len(self.decisionToDFA)):
+            self.discardDFA(self.decisionToDFA[mode])
+
+    # Replaces a mode's DFA with an empty one, which then grows again from
+    #  scratch. The DFA is replaced rather than cleared in place, so a token
+    #  match already in progress finishes with the DFA it started with.
+    def discardDFA(self, dfa:DFA):
+        if self.decisionToDFA[dfa.decision] is dfa:
+            self.decisionToDFA[dfa.decision] = DFA(dfa.atnStartState, dfa.decision)
+
     # Get the text matched so far for the current token.
     def getText(self, input:InputStream):
         # index is first lookahead char, don't include.
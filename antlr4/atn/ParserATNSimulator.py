@@ -257,13 +257,18 @@ from antlr4.error.Errors import NoViableAltException
 class ParserATNSimulator(ATNSimulator):
     __slots__ = (
         'parser', 'decisionToDFA', 'predictionMode', '_input', '_startIndex',
-        '_outerContext', '_dfa', 'mergeCache'
+        '_outerContext', '_dfa', 'mergeCache', 'll1Tables'
     )
 
     debug = False
     debug_list_atn_decisions = False
     dfa_debug = False
     retry_debug = False
+    # consult each decision's LL(1) table, if it has one, before adaptive prediction
+    ll1FastPath = True
+    # the maximum number of states in any one decision's DFA, or None for no
+    # limit; see discardDFA
+    maxDFAStates = None
 
 
     def __init__(self, parser:Parser, atn:ATN, decisionToDFA:list, sharedContextCache:PredictionContextCache):
@@ -286,17 +291,46 @@ class ParserATNSimulator(ATNSimulator):
         #  also be examined during cache lookup.
         #
         self.mergeCache = None
+        # The LL(1) prediction tables are computed once per ATN and shared by
+        #  all parsers using it; see LL1Analyzer.getDecisionTable.
+        if atn.ll1Tables is None:
+            from antlr4.LL1Analyzer import LL1Analyzer
+            analyzer = LL1Analyzer(atn)
+            atn.ll1Tables = [analyzer.getDecisionTable(s) for s in atn.decisionToState]
+        self.ll1Tables = atn.ll1Tables
 
 
     def reset(self):
         pass
 
+    # Replaces the DFA of every decision with an empty one; see discardDFA.
+    def clearDFA(self):
+        for decision in range(len(self.decisionToDFA)):
+            self.discardDFA(self.decisionToDFA[decision])
+
+    # Replaces a decision's DFA with an empty one, which then grows again from
+    #  scratch as predictions are made. The DFA is replaced rather than cleared
+    #  in place, so any prediction already in progress, in this or another
+    #  parser sharing the same decisionToDFA, finishes with the DFA it started
+    #  with; the old DFA is garbage once no prediction refers to it.
+    def discardDFA(self, dfa:DFA):
+        if self.decisionToDFA[dfa.decision] is dfa:
+            self.decisionToDFA[dfa.decision] = DFA(dfa.atnStartState, dfa.decision)
+
     def adaptivePredict(self, input:TokenStream, decision:int, outerContext:ParserRuleContext):
         if ParserATNSimulator.debug or ParserATNSimulator.debug_list_atn_decisions:
             print("adaptivePredict decision " + str(decision) +
                                    " exec LA(1)==" + self.getLookaheadName(input) +
                                    " line " + str(input.LT(1).line) + ":" +
                                    str(input.LT(1).column))
+        # When the next token alone determines the alternative, that's the
+        #  prediction in any context; no DFA or ATN simulation is needed.
+        table = self.ll1Tables[decision]
+        if table is not None and ParserATNSimulator.ll1FastPath:
+            alt = table[input.LA(1)]
+            if alt != ATN.INVALID_ALT_NUMBER:
+                return alt
+
         self._input = input
         self._startIndex = input.index
         self._outerContext = outerContext
@@ -1566,9 +1600,10 @@ class ParserATNSimulator(ATNSimulator):
         if from_ is None or t < -1 or t > self.atn.maxTokenType:
             return to
 
-        if from_.edges is None:
-            from_.edges = [None] * (self.atn.maxTokenType + 2)
-        from_.edges[t+1] = to # connect
+        with dfa.lock:
+            if from_.edges is None:
+                from_.edges = [None] * (self.atn.maxTokenType + 2)
+            from_.edges[t+1] = to # connect
 
         if ParserATNSimulator.debug:
             names = None if self.parser is None else self.parser.literalNames
@@ -1600,13 +1635,20 @@ class ParserATNSimulator(ATNSimulator):
         if existing is not None:
             return existing
 
-        D.stateNumber = len(dfa.states)
         if not D.configs.readonly:
             D.configs.optimizeConfigs(self)
             D.configs.setReadonly(True)
-        dfa.states[D] = D
+        with dfa.lock:
+            # another thread may have added an equivalent state meanwhile
+            existing = dfa.states.get(D, None)
+            if existing is not None:
+                return existing
+            D.stateNumber = len(dfa.states)
+            dfa.states[D] = D
         if ParserATNSimulator.debug:
             print("adding new DFA state: " + str(D))
+        if self.maxDFAStates is not None and len(dfa.states) > self.maxDFAStates:
+            self.discardDFA(dfa)
         return D
 
     def reportAttemptingFullContext(self, dfa:DFA, conflictingAlts:set, configs:ATNConfigSet, startIndex:int, stopIndex:int):
@@ -0,0 +1,143 @@
+#
+# Copyright (c) 2012-2017 The ANTLR Project. All rights reserved.
+# Use of this file is governed by the BSD 3-clause license that
+# can be found in the LICENSE.txt file in the project root.
+#/
+import time
+
+from antlr4.BufferedTokenStream import TokenStream
+from antlr4.ParserRuleContext import ParserRuleContext
+from antlr4.atn.ATNConfigSet import ATNConfigSet
+from antlr4.atn.ParserATNSimulator import ParserATNSimulator
+from antlr4.dfa.DFA import DFA
+from antlr4.dfa.DFAState import DFAState
+
+
+#
+# Profiling information about the predictions made for a single decision.
+# Lookahead depths are measured in tokens; times are in nanoseconds.
+#
+class DecisionInfo(object):
+    __slots__ = (
+        'decision', 'invocations', 'timeInPrediction', 'LL1_Predictions',
+        'SLL_TotalLook', 'SLL_MinLook', 'SLL_MaxLook',
+        'SLL_DFATransitions', 'SLL_ATNTransitions',
+        'LL_Fallback', 'LL_TotalLook', 'LL_MinLook', 'LL_MaxLook', 'LL_ATNTransitions',
+        'errors'
+    )
+
+    def __init__(self, decision:int):
+        self.decision = decision
+        # number of times adaptivePredict was called for this decision
+        self.invocations = 0
+        # total time spent in adaptivePredict for this decision
+        self.timeInPrediction = 0
+        # predictions made by the LL(1) table, without the DFA or ATN
+        self.LL1_Predictions = 0
+        # lookahead examined by SLL prediction (the DFA, and the ATN in SLL mode)
+        self.SLL_TotalLook = 0
+        self.SLL_MinLook = 0
+        self.SLL_MaxLook = 0
+        # transitions taken from the DFA cache, and computed by ATN simulation
+        self.SLL_DFATransitions = 0
+        self.SLL_ATNTransitions = 0
+        # predictions escalated to full-context (LL) prediction, and their lookahead
+        self.LL_Fallback = 0
+        self.LL_TotalLook = 0
+        self.LL_MinLook = 0
+        self.LL_MaxLook = 0
+        self.LL_ATNTransitions = 0
+        # predictions that found no viable alternative
+        self.errors = 0
+
+    def __str__(self):
+        return "{decision=" + str(self.decision) + ", invocations=" + str(self.invocations) + \
+               ", time=" + str(self.timeInPrediction) + ", SLL_lookahead=" + str(self.SLL_TotalLook) + \
+               ", SLL_ATNTransitions=" + str(self.SLL_ATNTransitions) + \
+               ", SLL_DFATransitions=" + str(self.SLL_DFATransitions) + \
+               ", LL_Fallback=" + str(self.LL_Fallback) + ", LL_lookahead=" + str(self.LL_TotalLook) + \
+               ", LL_ATNTransitions=" + str(self.LL_ATNTransitions) + "}"
+
+
+#
+# A {@link ParserATNSimulator} that records, for each decision, how often it is
+# predicted, how long prediction takes, how far it looks ahead, and how often
+# it is answered by the DFA cache rather than by ATN simulation or by
+# full-context prediction. Install it with {@link Parser#setProfile}.
+#
+class ProfilingATNSimulator(ParserATNSimulator):
+    __slots__ = ('decisions', 'numDecisions', '_sllStopIndex', '_llStopIndex', 'currentDecision')
+
+    def __init__(self, parser):
+        super().__init__(parser, parser._interp.atn, parser._interp.decisionToDFA, parser._interp.sharedContextCache)
+        self.numDecisions = len(self.atn.decisionToState)
+        self.decisions = [DecisionInfo(i) for i in range(self.numDecisions)]
+        self._sllStopIndex = -1
+        self._llStopIndex = -1
+        self.currentDecision = -1
+
+    def adaptivePredict(self, input:TokenStream, decision:int, outerContext:ParserRuleContext):
+        self._sllStopIndex = -1
+        self._llStopIndex = -1
+        self.currentDecision = decision
+        info = self.decisions[decision]
+        start = time.perf_counter_ns()
+        try:
+            alt = super().adaptivePredict(input, decision, outerContext)
+        finally:
+            info.timeInPrediction += time.perf_counter_ns() - start
+            info.invocations += 1
+
+        if self._sllStopIndex < 0:
+            # answered by the LL(1) table before reaching the DFA
+            info.LL1_Predictions += 1
+            SLL_k = 1
+        else:
+            SLL_k = self._sllStopIndex - self._startIndex + 1
+        info.SLL_TotalLook += SLL_k
+        info.SLL_MinLook = SLL_k if info.SLL_MinLook == 0 else min(info.SLL_MinLook, SLL_k)
+        info.SLL_MaxLook = max(info.SLL_MaxLook, SLL_k)
+
+        if self._llStopIndex >= 0:
+            LL_k = self._llStopIndex - self._startIndex + 1
+            info.LL_TotalLook += LL_k
+            info.LL_MinLook = LL_k if info.LL_MinLook == 0 else min(info.LL_MinLook, LL_k)
+            info.LL_MaxLook = max(info.LL_MaxLook, LL_k)
+        return alt
+
+    def getExistingTargetState(self, previousD:DFAState, t:int):
+        # this method is called after each time the input position advances
+        # during SLL prediction
+        self._sllStopIndex = self._input.index
+        existingTargetState = super().getExistingTargetState(previousD, t)
+        if existingTargetState is not None:
+            self.decisions[self.currentDecision].SLL_DFATransitions += 1
+            if existingTargetState is self.ERROR:
+                self.decisions[self.currentDecision].errors += 1
+        return existingTargetState
+
+    def computeTargetState(self, dfa:DFA, previousD:DFAState, t:int):
+        state = super().computeTargetState(dfa, previousD, t)
+        if state is self.ERROR:
+            self.decisions[self.currentDecision].errors += 1
+        return state
+
+    def computeReachSet(self, closure:ATNConfigSet, t:int, fullCtx:bool):
+        if fullCtx:
+            # this method is called after each time the input position advances
+            # during full-context prediction
+            self._llStopIndex = self._input.index
+        reachConfigs = super().computeReachSet(closure, t, fullCtx)
+        if fullCtx:
+            self.decisions[self.currentDecision].LL_ATNTransitions += 1
+        else:
+            self.decisions[self.currentDecision].SLL_ATNTransitions += 1
+        return reachConfigs
+
+    def reportAttemptingFullContext(self, dfa:DFA, conflictingAlts:set, configs:ATNConfigSet,
+                                    startIndex:int, stopIndex:int):
+        self.decisions[self.currentDecision].LL_Fallback += 1
+        super().reportAttemptingFullContext(dfa, conflictingAlts, configs, startIndex, stopIndex)
+
+    def getDecisionInfo(self):
+        return self.decisions
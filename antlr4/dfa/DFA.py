@@ -2,6 +2,8 @@
 # Copyright (c) 2012-2017 The ANTLR Project. All rights reserved.
 # Use of this file is governed by the BSD 3-clause license that
 # can be found in the LICENSE.txt file in the project root.
+import threading
+
 from antlr4.atn.ATNState import StarLoopEntryState
 
 from antlr4.atn.ATNConfigSet import ATNConfigSet
@@ -11,7 +13,7 @@ from antlr4.error.Errors import IllegalStateException
 
 
 class DFA(object):
-    __slots__ = ('atnStartState', 'decision', '_states', 's0', 'precedenceDfa')
+    __slots__ = ('atnStartState', 'decision', '_states', 's0', 'precedenceDfa', 'lock')
 
     def __init__(self, atnStartState:DecisionState, decision:int=0):
         # From which ATN state did we create this DFA?
@@ -25,6 +27,11 @@ class DFA(object):
         # {@code false}. This is the backing field for {@link #isPrecedenceDfa},
         # {@link #setPrecedenceDfa}.
         self.precedenceDfa = False
+        # Guards the addition of states and edges when the DFA is shared by
+        # recognizers running in several threads. Reads take no lock: a state
+        # or edge is only published once it is complete, so a reader sees
+        # either nothing (and computes it again) or the finished object.
+        self.lock = threading.Lock()
 
         if isinstance(atnStartState, StarLoopEntryState):
             if atnStartState.isPrecedenceDecision:
@@ -73,10 +80,11 @@ class DFA(object):
         # synchronization on s0 here is ok. when the DFA is turned into a
         # precedence DFA, s0 will be initialized once and not updated again
         # s0.edges is never null for a precedence DFA
-        if precedence >= len(self.s0.edges):
-            ext = [None] * (precedence + 1 - len(self.s0.edges))
-            self.s0.edges.extend(ext)
-        self.s0.edges[precedence] = startState
+        with self.lock:
+            if precedence >= len(self.s0.edges):
+                ext = [None] * (precedence + 1 - len(self.s0.edges))
+                self.s0.edges.extend(ext)
+            self.s0.edges[precedence] = startState
     #
     # Sets whether this is a precedence DFA. If the specified value differs
     # from the current DFA configuration, the following actions are taken;
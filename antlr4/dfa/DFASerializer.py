@@ -5,6 +5,7 @@
 #/
 
 # A DFA walker that knows how to dump them to serialized strings.#/
+import itertools
 from io import StringIO
 from antlr4 import DFA
 from antlr4.Utils import str_list
@@ -24,11 +25,10 @@ class DFASerializer(object):
             return None
         with StringIO() as buf:
             for s in self.dfa.sortedStates():
-                n = 0
-                if s.edges is not None:
-                    n = len(s.edges)
-                for i in range(0, n):
-                    t = s.edges[i]
+                edges = enumerate(s.edges) if s.edges is not None else []
+                if s.sparseEdges is not None:
+                    edges = itertools.chain(edges, sorted(s.sparseEdges.items()))
+                for i, t in edges:
                     if t is not None and t.stateNumber != 0x7FFFFFFF:
                         buf.write(self.getStateString(s))
                         label = self.getEdgeLabel(i)
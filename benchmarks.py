@@ -0,0 +1,353 @@
+"""
+Performance benchmarks for lexing, parsing and semantic analysis of Nimble
+programs, run over synthetic corpora of configurable size.
+
+Each benchmark runs a phase of the pipeline over a generated source, repeats it,
+and reports the best time together with a throughput figure: tokens per second
+for the lexer, parse tree nodes per second for the parser, and nodes per second
+for the InferTypesAndCheckConstraints walk. Results can be written as JSON for
+regression tracking, e.g.:
+
+    python benchmarks.py --size 2000 --repeat 5 --json bench.json
+
+The first repetition of each benchmark warms the lexer and parser DFA caches,
+which are shared by all instances; it is not counted.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+from antlr4 import CommonTokenStream, InputStream, ParseTreeWalker, ParserRuleContext
+from chunkedlexer import lex_in_parallel
+from errorlog import ErrorLog
+from exprparser import PrecedenceClimbingParser
+from generic_parser import parse
+from instrumentation import count_nodes
+from nimble import NimbleLexer, NimbleParser
+from nimblesemantics import InferTypesAndCheckConstraints
+from parallel import parse_in_parallel
+from scanninglexer import ScanningLexer, OffsetScanningLexer
+from sharedtokens import SharedTokenSource, lex_to_shared
+from streaming import analyze_streaming
+from symboltable import SymbolTable
+
+# --------------------------------------------------------
+# Synthetic corpora
+# --------------------------------------------------------
+
+EXPRESSION_DEPTH = 20
+
+
+def deep_expressions(size):
+    """`size` print statements, each of a parenthesized expression nested EXPRESSION_DEPTH deep."""
+    lines = ['var a : Int = 1']
+    for i in range(size):
+        expression = str(i)
+        for depth in range(EXPRESSION_DEPTH):
+            op = '+-*/'[depth % 4]
+            expression = f'({expression} {op} a)'
+        lines.append(f'print {expression} < {i}')
+    return '\n'.join(lines)
+
+
+def long_expressions(size):
+    """Ten statements, each a flat chain of `size` binary operations."""
+    lines = ['var a : Int = 1', 'var b : Bool']
+    for i in range(10):
+        terms = ' + '.join(f'a * {j}' if j % 2 else f'{j} - a' for j in range(size))
+        lines.append(f'b = {terms} < {i}')
+    return '\n'.join(lines)
+
+
+def long_statement_list(size):
+    """`size` variable declarations, followed by `size` assignments, ifs and whiles."""
+    lines = [f'var v{i} : Int = {i}' for i in range(size)]
+    for i in range(size):
+        kind = i % 3
+        if kind == 0:
+            lines.append(f'v{i} = v{i} + {i} * 2')
+        elif kind == 1:
+            lines.append(f'if v{i} < {i} {{ print v{i} }} else {{ v{i} = 0 }}')
+        else:
+            lines.append(f'while v{i} == 0 {{ v{i} = v{i} - 1 }}')
+    return '\n'.join(lines)
+
+
+def many_functions(size):
+    """`size` function definitions, each calling the next, and a main calling the first."""
+    lines = []
+    for i in range(size):
+        lines.append(f'func f{i}(a : Int, s : String) -> Int {{\n'
+                     f'    var b : Int = a * 2\n'
+                     f'    if b < {i} {{ return f{(i + 1) % size}(b, s + "x") }}\n'
+                     f'    return b\n'
+                     f'}}')
+    lines.append('var result : Int = f0(1, "")')
+    lines.append('print result')
+    return '\n'.join(lines)
+
+
+def many_identifiers(size):
+    """`size` * 10 declarations of long-named variables, each assigned from the previous ones."""
+    names = [f'quantity_of_item_{i}' for i in range(size * 10)]
+    lines = [f'var {name} : Int = {i}' for i, name in enumerate(names)]
+    for i, name in enumerate(names[3:], 3):
+        lines.append(f'{name} = {names[i - 1]} + {names[i - 2]} * {names[i - 3]}')
+    lines.append(f'print {names[-1]}')
+    return '\n'.join(lines)
+
+
+def huge_strings(size):
+    """Ten string literals, each of about `size` * 100 characters, concatenated and printed."""
+    chunk = 'Lorem ipsum dolor sit amet, consectetur \\n adipiscing elit \\t sed do eiusmod tempor.  '
+    literal = (chunk * (size * 100 // len(chunk) + 1))[:size * 100].rstrip('\\')
+    lines = [f'var s{i} : String = "{literal}"' for i in range(10)]
+    lines.append('print ' + ' + '.join(f's{i}' for i in range(10)))
+    return '\n'.join(lines)
+
+
+def unicode_comments(size):
+    """`size` * 10 statements, each after a comment of mostly non-ASCII text."""
+    text = 'Grüße, 世界! Ελληνικά — ½ café naïve ∑ ✓ 🙂 ' * 3
+    lines = []
+    for i in range(size * 10):
+        lines.append(f'// {text}{i}')
+        lines.append(f'var s{i} : String = "s{i}"')
+    lines.append('print s0')
+    return '\n'.join(lines)
+
+
+CORPORA = {
+    'deep_expressions': deep_expressions,
+    'long_expressions': long_expressions,
+    'long_statement_list': long_statement_list,
+    'many_functions': many_functions,
+    'many_identifiers': many_identifiers,
+    'huge_strings': huge_strings,
+    'unicode_comments': unicode_comments,
+}
+
+# --------------------------------------------------------
+# Benchmarks
+# Each takes the source and returns (count, seconds) for one run.
+# --------------------------------------------------------
+
+
+def bench_lex(source, lexer_class=NimbleLexer):
+    lexer = lexer_class(InputStream(source))
+    start = time.perf_counter()
+    tokens = lexer.getAllTokens()
+    return len(tokens), time.perf_counter() - start
+
+
+def bench_lex_scanning(source):
+    return bench_lex(source, ScanningLexer)
+
+
+def bench_lex_offsets(source):
+    return bench_lex(source, OffsetScanningLexer)
+
+
+def bench_lex_chunked(source):
+    # chunks of 4096 characters or more, so that small corpora are split too
+    start = time.perf_counter()
+    token_stream, _ = lex_in_parallel(source, min_chunk_size=4096)
+    token_stream.fill()
+    return len(token_stream.tokens) - 1, time.perf_counter() - start
+
+
+def bench_lex_shared(source):
+    # lexing into shared memory, and reading the tokens back as a parser would
+    start = time.perf_counter()
+    buffer, _ = lex_to_shared(source, min_chunk_size=4096)
+    with buffer:
+        token_stream = CommonTokenStream(SharedTokenSource(buffer))
+        token_stream.fill()
+        elapsed = time.perf_counter() - start
+        buffer.unlink()
+    return len(token_stream.tokens) - 1, elapsed
+
+
+def bench_token_text(source):
+    # three reads of each token's text, as by the analyzer and error reports
+    token_stream = CommonTokenStream(NimbleLexer(InputStream(source)))
+    token_stream.fill()
+    tokens = token_stream.tokens
+    start = time.perf_counter()
+    for token in tokens:
+        token.text
+        token.text
+        token.text
+    return len(tokens), time.perf_counter() - start
+
+
+def bench_parse(source, parser_class=NimbleParser):
+    lexer = NimbleLexer(InputStream(source))
+    token_stream = CommonTokenStream(lexer)
+    token_stream.fill()
+    parser = parser_class(token_stream)
+    start = time.perf_counter()
+    tree = parser.script()
+    elapsed = time.perf_counter() - start
+    return count_nodes(tree), elapsed
+
+
+def bench_parse_precedence_climbing(source):
+    return bench_parse(source, PrecedenceClimbingParser)
+
+
+def bench_parse_parallel(source):
+    # includes lexing, which the workers repeat for their functions
+    start = time.perf_counter()
+    tree = parse_in_parallel(source)
+    elapsed = time.perf_counter() - start
+    return count_nodes(tree), elapsed
+
+
+def bench_analyze(source, symbols=None):
+    tree = parse(source, 'script', NimbleLexer, NimbleParser, symbols=symbols)
+    analyzer = InferTypesAndCheckConstraints(ErrorLog(), {})
+    start = time.perf_counter()
+    ParseTreeWalker().walk(analyzer, tree)
+    elapsed = time.perf_counter() - start
+    return count_nodes(tree), elapsed
+
+
+def bench_analyze_interned(source):
+    return bench_analyze(source, SymbolTable())
+
+
+def bench_reanalyze(source):
+    # a second analyzer walk over the same tree, as when several listeners visit it
+    tree = parse(source, 'script', NimbleLexer, NimbleParser)
+    ParseTreeWalker().walk(InferTypesAndCheckConstraints(ErrorLog(), {}), tree)
+    analyzer = InferTypesAndCheckConstraints(ErrorLog(), {})
+    start = time.perf_counter()
+    ParseTreeWalker().walk(analyzer, tree)
+    elapsed = time.perf_counter() - start
+    return count_nodes(tree), elapsed
+
+
+def bench_analyze_streaming(source):
+    # parse and analysis together, since the one is driven by the other
+    start = time.perf_counter()
+    analyze_streaming(source)
+    return source.count('\n') + 1, time.perf_counter() - start
+
+
+# the statement decision, the return expression option, and the expr primary and operator loop
+PREDICTION_DECISIONS = (8, 9, 10, 12)
+
+
+def bench_reach_sets(source):
+    """
+    Full-context ATN simulation without the DFA: computes the reach set of several
+    decisions' start states on each token of the source, exercising `closure` and
+    the ATNConfigSet operations behind it. Counts computeReachSet calls.
+    """
+    token_stream = CommonTokenStream(NimbleLexer(InputStream(source)))
+    token_stream.fill()
+    simulator = NimbleParser(token_stream)._interp
+    simulator._input = token_stream
+    simulator._outerContext = ParserRuleContext.EMPTY
+    start_states = [simulator.computeStartState(simulator.atn.decisionToState[decision],
+                                                ParserRuleContext.EMPTY, True)
+                    for decision in PREDICTION_DECISIONS]
+    token_types = [token.type for token in token_stream.tokens]
+    start = time.perf_counter()
+    for token_type in token_types:
+        for start_state in start_states:
+            simulator.computeReachSet(start_state, token_type, True)
+    return len(token_types) * len(start_states), time.perf_counter() - start
+
+
+BENCHMARKS = {
+    'lex': ('tokens', bench_lex),
+    'lex_scanning': ('tokens', bench_lex_scanning),
+    'lex_offsets': ('tokens', bench_lex_offsets),
+    'lex_chunked': ('tokens', bench_lex_chunked),
+    'lex_shared': ('tokens', bench_lex_shared),
+    'token_text': ('tokens', bench_token_text),
+    'parse': ('nodes', bench_parse),
+    'parse_precedence_climbing': ('nodes', bench_parse_precedence_climbing),
+    'parse_parallel': ('nodes', bench_parse_parallel),
+    'analyze': ('nodes', bench_analyze),
+    'analyze_interned': ('nodes', bench_analyze_interned),
+    'reanalyze': ('nodes', bench_reanalyze),
+    'analyze_streaming': ('lines', bench_analyze_streaming),
+    'reach_sets': ('reach_sets', bench_reach_sets),
+}
+
+# --------------------------------------------------------
+# Runner
+# --------------------------------------------------------
+
+
+def run(corpus_names, benchmark_names, size, repeat):
+    """
+    Runs each named benchmark over each named corpus, `repeat` times after one
+    warm-up run, and returns a JSON-serializable dictionary of results.
+    """
+    results = {
+        'python': platform.python_version(),
+        'size': size,
+        'repeat': repeat,
+        'results': [],
+    }
+    for corpus_name in corpus_names:
+        source = CORPORA[corpus_name](size)
+        for benchmark_name in benchmark_names:
+            unit, benchmark = BENCHMARKS[benchmark_name]
+            benchmark(source)
+            timings = [benchmark(source) for _ in range(repeat)]
+            count = timings[0][0]
+            best = min(seconds for _, seconds in timings)
+            results['results'].append({
+                'corpus': corpus_name,
+                'benchmark': benchmark_name,
+                'characters': len(source),
+                unit: count,
+                'best_seconds': best,
+                'mean_seconds': sum(seconds for _, seconds in timings) / len(timings),
+                f'{unit}_per_second': count / best if best else None,
+            })
+    return results
+
+
+def format_results(results):
+    lines = []
+    for r in results['results']:
+        unit = next(key for key in r if key.endswith('_per_second'))
+        lines.append(f"{r['corpus']:22} {r['benchmark']:26} {r['best_seconds'] * 1000:10.2f} ms"
+                     f"  {r[unit]:14,.0f} {unit.replace('_', ' ')}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--size', type=int, default=500, help='corpus size parameter')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark')
+    arg_parser.add_argument('--corpus', action='append', choices=sorted(CORPORA),
+                            help='corpus to run (repeatable; default all)')
+    arg_parser.add_argument('--benchmark', action='append', choices=sorted(BENCHMARKS),
+                            help='benchmark to run (repeatable; default all)')
+    arg_parser.add_argument('--json', metavar='PATH', help="write results as JSON ('-' for stdout)")
+    args = arg_parser.parse_args(argv)
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    results = run(args.corpus or list(CORPORA), args.benchmark or list(BENCHMARKS),
+                  args.size, args.repeat)
+    if args.json == '-':
+        json.dump(results, sys.stdout, indent=1)
+    else:
+        print(format_results(results))
+        if args.json:
+            with open(args.json, 'w') as file:
+                json.dump(results, file, indent=1)
+
+
+if __name__ == '__main__':
+    main()
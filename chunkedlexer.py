@@ -0,0 +1,151 @@
+"""
+The chunkedlexer module lexes a large Nimble source in parallel, in chunks.
+
+No Nimble token can span a line break except a run of whitespace, which is
+skipped: STRING and COMMENT both end at the end of their line. So a source split
+just after any newline lexes, chunk by chunk, to the same tokens as it does
+whole, apart from the EOF at the end of each chunk. `lex_in_parallel` splits the
+source into chunks after newlines, lexes each chunk in a worker process, and
+stitches the chunks' tokens together, shifting their character offsets and line
+numbers by where each chunk begins. The workers return their tokens as
+`TokenColumns`, parallel arrays of token fields, which pickle far more compactly
+than CommonTokens; the tokens themselves are only created once stitched, with
+text sliced from the whole source, as the lexer would have created them.
+"""
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import os
+
+from antlr4 import CommonTokenStream, InputStream, Token
+from antlr4.ListTokenSource import ListTokenSource
+from antlr4.Token import CommonToken
+from antlr4.error.ErrorListener import ErrorListener
+from nimble import NimbleLexer
+
+
+def lex_in_parallel(source, lexer_class=NimbleLexer, max_workers=None, min_chunk_size=1 << 16):
+    """
+    Lexes the source in chunks of at least `min_chunk_size` characters, in up to
+    `max_workers` processes. Returns a CommonTokenStream over the same tokens, with
+    the same token indices, lines and columns, as lexing the whole source with
+    `lexer_class` gives, and any lexer errors as (line, column, message) triples.
+
+    A source too small to make two chunks, or with only one worker, is lexed in the
+    calling process.
+    """
+    workers = max_workers or os.cpu_count() or 1
+    chunk_count = min(workers * 4, len(source) // max(1, min_chunk_size)) if workers > 1 else 1
+    chunks = split_at_newlines(source, chunk_count)
+    texts = [source[start:stop] for start, stop, _ in chunks]
+    if len(chunks) == 1:
+        results = [lex_chunk(texts[0], lexer_class)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lex_chunk, texts, repeat(lexer_class)))
+
+    columns = TokenColumns()
+    errors = []
+    last = len(chunks) - 1
+    for i, ((start, _, line), (chunk_columns, chunk_errors)) in enumerate(zip(chunks, results)):
+        # every chunk but the last ends with an EOF that isn't the end of the source
+        count = len(chunk_columns) if i == last else len(chunk_columns) - 1
+        columns.extend(chunk_columns, count, start, line - 1)
+        errors.extend((error_line + line - 1, column, message) for error_line, column, message in chunk_errors)
+
+    lexer = lexer_class(InputStream(source))
+    return CommonTokenStream(ListTokenSource(columns.tokens(lexer, lexer.inputStream))), errors
+
+
+def split_at_newlines(source, chunk_count):
+    """
+    Splits the source into about `chunk_count` chunks of similar size, each but the
+    last ending just after a newline. Returns the (start, stop, line) of each chunk:
+    its character offsets, stop exclusive, and the line on which it begins.
+    """
+    chunks = []
+    start = 0
+    line = 1
+    size = max(1, len(source) // max(1, chunk_count))
+    while start < len(source):
+        newline = source.find('\n', start + size - 1)
+        stop = len(source) if newline < 0 else newline + 1
+        chunks.append((start, stop, line))
+        line += source.count('\n', start, stop)
+        start = stop
+    return chunks or [(0, 0, 1)]
+
+
+def lex_chunk(text, lexer_class=NimbleLexer):
+    """
+    Lexes one chunk, as if it began a source. Returns its tokens, including the final
+    EOF, as TokenColumns, and its lexer errors as (line, column, message) triples.
+    """
+    lexer = lexer_class(InputStream(text))
+    lexer.removeErrorListeners()
+    errors = ErrorCollector()
+    lexer.addErrorListener(errors)
+    columns = TokenColumns()
+    token = lexer.nextToken()
+    while token.type != Token.EOF:
+        columns.append(token)
+        token = lexer.nextToken()
+    columns.append(token)
+    return columns, errors.errors
+
+
+class TokenColumns:
+    """
+    The fields of a sequence of tokens, in one array per field. Token text isn't
+    stored; tokens created from the columns slice it from their input stream.
+    """
+
+    FIELDS = ('type', 'channel', 'start', 'stop', 'line', 'column')
+
+    def __init__(self):
+        for name in self.FIELDS:
+            setattr(self, name, array('i'))
+
+    def __len__(self):
+        return len(self.type)
+
+    def append(self, token: Token):
+        for name in self.FIELDS:
+            getattr(self, name).append(getattr(token, name))
+
+    def extend(self, other, count, offset, line_offset):
+        """
+        Appends the first `count` tokens of `other`, shifting their character offsets
+        by `offset` and their lines by `line_offset`. Columns are left unchanged, so
+        `other` must begin at the start of a line.
+        """
+        self.type.extend(other.type[:count])
+        self.channel.extend(other.channel[:count])
+        self.start.extend(start + offset for start in other.start[:count])
+        self.stop.extend(stop + offset for stop in other.stop[:count])
+        self.line.extend(line + line_offset for line in other.line[:count])
+        self.column.extend(other.column[:count])
+
+    def tokens(self, lexer, input_stream):
+        """CommonTokens for the columns, from the given lexer and input stream, numbered in order."""
+        source = (lexer, input_stream)
+        tokens = []
+        for index, (ttype, channel, start, stop, line, column) in enumerate(
+                zip(self.type, self.channel, self.start, self.stop, self.line, self.column)):
+            t = CommonToken(source, ttype, channel, start, stop)
+            t.line = line
+            t.column = column
+            t.tokenIndex = index
+            tokens.append(t)
+        return tokens
+
+
+class ErrorCollector(ErrorListener):
+    """Collects the syntax errors reported to it as (line, column, message) triples."""
+
+    def __init__(self):
+        self.errors = []
+
+    def syntaxError(self, recognizer, offending_symbol, line, column, msg, e):
+        self.errors.append((line, column, msg))
@@ -25,6 +25,8 @@ class Category(Enum):
     INVALID_BINARY_OP = auto()  # binary operator applied to incompatible left and right expressions
     CONDITION_NOT_BOOL = auto()  # condition on if or while statement not a Bool
     UNPRINTABLE_EXPRESSION = auto() # expression in print is not a valid type
+    INVALID_CALL = auto()  # function call with wrong number or types of arguments
+    INVALID_RETURN = auto()  # return value incompatible with the enclosing function's return type
 
     def __str__(self):
         return self.name
@@ -43,8 +45,40 @@ class Entry:
         """The source code line on which the semantic error was detected."""
         return self.ctx.start.line
 
+    def source(self) -> str:
+        """The source of the node on which the error was detected, with all whitespace removed."""
+        return self.ctx.getText()
+
+    def detach(self):
+        """A DetachedEntry with the same content, holding no reference to the parse tree."""
+        return DetachedEntry(self.line(), self.source(), self.category, self.message)
+
+    def __repr__(self):
+        return f'line {self.line()} : {self.category} : {self.message}\n    {self.source()}'
+
+
+@dataclass
+class DetachedEntry:
+    """
+    A record of a semantic error separated from its parse tree, e.g., so that it can be
+    passed between processes. Offers the same line() and source() as an Entry.
+    """
+    line_number: int
+    source_text: str
+    category: Category
+    message: str
+
+    def line(self) -> int:
+        return self.line_number
+
+    def source(self) -> str:
+        return self.source_text
+
+    def detach(self):
+        return self
+
     def __repr__(self):
-        return f'line {self.line()} : {self.category} : {self.message}\n    {self.ctx.getText()}'
+        return f'line {self.line()} : {self.category} : {self.message}\n    {self.source()}'
 
 
 class ErrorLog:
@@ -57,8 +91,22 @@ class ErrorLog:
         self.__entries = defaultdict(dict)
 
     def add(self, ctx: ParserRuleContext, category: Category, message: str):
-        entry = Entry(ctx, category, message)
-        self.__entries[entry.line()][ctx.getText()] = entry
+        self.add_entry(Entry(ctx, category, message))
+
+    def add_entry(self, entry):
+        """Adds an existing Entry or DetachedEntry to the log."""
+        self.__entries[entry.line()][entry.source()] = entry
+
+    def entries(self):
+        """All entries in the log, ordered by line."""
+        return [entry
+                for line in sorted(self.__entries.keys())
+                for entry in self.__entries[line].values()]
+
+    def merge(self, other):
+        """Adds all of the entries of another ErrorLog to this one."""
+        for entry in other.entries():
+            self.add_entry(entry)
 
     def includes_exactly(self, category: Category, line: int, source: str) -> bool:
         """
@@ -80,8 +128,4 @@ class ErrorLog:
         return sum(len(entry) for entry in self.__entries.values())
 
     def __str__(self):
-        error_list = [str(entry)
-                      for line in sorted(self.__entries.keys())
-                      for entry in self.__entries[line].values()
-                      ]
-        return '\n'.join(error_list)
+        return '\n'.join(str(entry) for entry in self.entries())
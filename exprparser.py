@@ -0,0 +1,132 @@
+"""
+The exprparser module provides an alternative engine for parsing Nimble
+expressions, by precedence climbing over the token stream.
+
+The generated `NimbleParser.expr` handles the left-recursive `expr` rule with
+adaptive prediction: one prediction to choose the primary expression, and two
+more (each evaluating precedence predicates) for every binary operator. Since
+every choice in `expr` is decided by the next token, or the next two tokens for
+a function call, `PrecedenceClimbingParser.expr` decides them directly instead,
+looking each operator up in a table of precedence levels.
+
+It builds exactly the same tree as the generated parser (the same
+`MulDivContext`, `AddSubContext`, `CompareContext`, etc. nodes, with the same
+start and stop tokens), fires the same parse listener events, and on erroneous
+input defers to the generated code so syntax errors are reported identically.
+Select it for a parse by passing it as the parser class, e.g.:
+
+    tree = parse(source, 'script', NimbleLexer, PrecedenceClimbingParser)
+"""
+
+from antlr4.error.Errors import RecognitionException
+from nimble import NimbleParser
+
+_RULE_STATE = 18  # the start state of the expr rule
+
+# token type -> (precedence, context class, ATN state of the alternative)
+# The right operand is parsed at one level higher, making each operator left-associative.
+_BINARY_OPERATORS = {
+    NimbleParser.T__17: (8, NimbleParser.MulDivContext, 126),   # '*'
+    NimbleParser.T__18: (8, NimbleParser.MulDivContext, 126),   # '/'
+    NimbleParser.T__16: (7, NimbleParser.AddSubContext, 129),   # '-'
+    NimbleParser.T__19: (7, NimbleParser.AddSubContext, 129),   # '+'
+    NimbleParser.T__20: (6, NimbleParser.CompareContext, 132),  # '<'
+    NimbleParser.T__21: (6, NimbleParser.CompareContext, 132),  # '<='
+    NimbleParser.T__22: (6, NimbleParser.CompareContext, 132),  # '=='
+}
+
+# token type -> (context class, ATN state) of the primary expressions consisting of a single token
+_LITERALS = {
+    NimbleParser.STRING: (NimbleParser.StringLiteralContext, 121),
+    NimbleParser.INT: (NimbleParser.IntLiteralContext, 122),
+    NimbleParser.BOOL: (NimbleParser.BoolLiteralContext, 123),
+}
+
+_PRIMARY_START = frozenset([NimbleParser.T__1, NimbleParser.T__15, NimbleParser.T__16,
+                            NimbleParser.ID, *_LITERALS])
+
+
+class PrecedenceClimbingParser(NimbleParser):
+    """A NimbleParser whose `expr` rule is parsed by precedence climbing."""
+
+    def expr(self, _p: int = 0):
+        la = self._input.LA(1)
+        if la not in _PRIMARY_START:
+            # no expression can start here; let the generated parser report it
+            return super().expr(_p)
+
+        _parentctx = self._ctx
+        _parentState = self.state
+        localctx = NimbleParser.ExprContext(self, self._ctx, _parentState)
+        self.enterRecursionRule(localctx, _RULE_STATE, self.RULE_expr, _p)
+        try:
+            self.enterOuterAlt(localctx, 1)
+            localctx = self._primary(localctx, la)
+            self._ctx.stop = self._input.LT(-1)
+
+            operator = _BINARY_OPERATORS.get(self._input.LA(1))
+            while operator is not None and operator[0] >= _p:
+                precedence, context_class, state = operator
+                if self._parseListeners is not None:
+                    self.triggerExitRuleEvent()
+                localctx = context_class(self, NimbleParser.ExprContext(self, _parentctx, _parentState))
+                self.pushNewRecursionContext(localctx, _RULE_STATE, self.RULE_expr)
+                self.state = state + 1
+                localctx.op = self._input.LT(1)
+                self._errHandler.reportMatch(self)
+                self.consume()
+                self.state = state + 2
+                self.expr(precedence + 1)
+                self.state = 139
+                operator = _BINARY_OPERATORS.get(self._input.LA(1))
+
+        except RecognitionException as re:
+            localctx.exception = re
+            self._errHandler.reportError(self, re)
+            self._errHandler.recover(self, re)
+        finally:
+            self.unrollRecursionContexts(_parentctx)
+        return localctx
+
+    def _primary(self, localctx, la):
+        """Parses the primary expression starting with token type `la`; returns its context."""
+        if la == NimbleParser.T__1:
+            localctx = NimbleParser.ParensContext(self, localctx)
+            self._ctx = localctx
+            self.state = 113
+            self.match(NimbleParser.T__1)
+            self.state = 114
+            self.expr(0)
+            self.state = 115
+            self.match(NimbleParser.T__3)
+
+        elif la == NimbleParser.T__15 or la == NimbleParser.T__16:
+            localctx = NimbleParser.NegContext(self, localctx)
+            self._ctx = localctx
+            self.state = 117
+            localctx.op = self._input.LT(1)
+            self._errHandler.reportMatch(self)
+            self.consume()
+            self.state = 118
+            self.expr(9)
+
+        elif la == NimbleParser.ID:
+            if self._input.LA(2) == NimbleParser.T__1:
+                localctx = NimbleParser.FuncCallExprContext(self, localctx)
+                self._ctx = localctx
+                self.state = 119
+                self.funcCall()
+            else:
+                localctx = NimbleParser.VariableContext(self, localctx)
+                self._ctx = localctx
+                self.state = 120
+                self.match(NimbleParser.ID)
+
+        else:
+            context_class, state = _LITERALS[la]
+            localctx = context_class(self, localctx)
+            self._ctx = localctx
+            self.state = state
+            self.match(la)
+
+        return localctx
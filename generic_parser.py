@@ -11,9 +11,12 @@ from dataclasses import dataclass
 
 from antlr4 import FileStream, InputStream, CommonTokenStream,\
     Recognizer, RecognitionException, Token
+import instrumentation
+from interning import InterningTokenFactory
 
 
-def parse(source_or_path, start_rule_name, lexer_class, parser_class, from_file=False):
+def parse(source_or_path, start_rule_name, lexer_class, parser_class, from_file=False,
+          line=1, column=0, symbols=None):
     """
     Creates a parser on the provided source or source file, adds a `SyntaxErrorLog` as
     error listener at both the lex and parse stages, and attempts the parse from the given
@@ -25,24 +28,47 @@ def parse(source_or_path, start_rule_name, lexer_class, parser_class, from_file=
     :param lexer_class: A generated ANTLR lexer class
     :param parser_class: A generated ANTLR parser class
     :param from_file: True if input is a file
+    :param line: The line number of the first character of the source, for when the
+        source is an extract from a larger file
+    :param column: The column of the first character of the source
+    :param symbols: A symboltable.SymbolTable into which to intern the lexer's ID tokens,
+        if any
     :return: The computed ANTLR parse tree
     """
-    if from_file:
-        character_stream = FileStream(source_or_path)
-    else:
-        character_stream = InputStream(source_or_path)
-    lexer = lexer_class(character_stream)
-    token_stream = CommonTokenStream(lexer)
-    parser = parser_class(token_stream)
-
-    lexer.removeErrorListeners()
-    parser.removeErrorListeners()
-    error_log = SyntaxErrorLog()
-    lexer.addErrorListener(error_log)
-    parser.addErrorListener(error_log)
-
-    parse_function = parser.__getattribute__(start_rule_name)
-    parse_tree = parse_function()
+    hooks = instrumentation.current()
+    with hooks.file(source_or_path if from_file else '<source>'):
+        if from_file:
+            character_stream = FileStream(source_or_path)
+        else:
+            character_stream = InputStream(source_or_path)
+        lexer = lexer_class(character_stream)
+        lexer.line = line
+        lexer.column = column
+        token_stream = CommonTokenStream(lexer)
+        parser = parser_class(token_stream)
+        if symbols is not None:
+            parser.setTokenFactory(InterningTokenFactory(symbols, lexer_class.ID))
+
+        lexer.removeErrorListeners()
+        parser.removeErrorListeners()
+        error_log = SyntaxErrorLog()
+        lexer.addErrorListener(error_log)
+        parser.addErrorListener(error_log)
+
+        parse_function = parser.__getattribute__(start_rule_name)
+        if not hooks.enabled:
+            parse_tree = parse_function()
+        else:
+            dfa_states = instrumentation.dfa_states(lexer_class, parser_class)
+            with hooks.phase('lex'):
+                token_stream.fill()
+            with hooks.phase('parse'):
+                parse_tree = parse_function()
+            hooks.count('tokens', len(token_stream.tokens))
+            hooks.count('nodes', instrumentation.count_nodes(parse_tree))
+            hooks.count('dfa_states_added',
+                        instrumentation.dfa_states(lexer_class, parser_class) - dfa_states)
+            hooks.count('syntax_errors', error_log.total_entries())
 
     if error_log.has_errors():
         raise SyntaxErrors(error_log, parse_tree)
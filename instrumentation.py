@@ -0,0 +1,189 @@
+"""
+The instrumentation module measures the Nimble pipeline file by file: wall time
+per phase (lexing, parsing, type checking and walking), token and parse tree node
+counts, growth of the shared prediction DFAs, and error counts.
+
+Hooks in `generic_parser.parse` and `testhelpers.do_semantic_analysis` report to
+the current instrumentation. By default that is a no-op `Instrumentation`, whose
+hooks do nothing and which the pipeline checks before doing any measuring, so
+the cost when disabled is a few attribute lookups per file. To collect metrics:
+
+    recorder = MetricsRecorder()
+    with instrumented(recorder):
+        for path in paths:
+            parse(path, 'script', NimbleLexer, NimbleParser, from_file=True)
+    print(recorder.to_json())        # or recorder.to_prometheus()
+
+While instrumentation is enabled, `parse` lexes the whole file before parsing
+so the two phases can be timed separately; lexer errors are then logged before
+any parser errors.
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+import json
+import time
+
+from antlr4 import TerminalNode
+
+
+class Instrumentation:
+    """
+    The no-op instrumentation, and the interface for others. Code reporting to
+    an instrumentation should do any work needed only to compute a measurement
+    when `enabled` is True.
+    """
+    enabled = False
+
+    def file(self, name: str):
+        """A context in which measurements are attributed to the named file."""
+        return _NO_CONTEXT
+
+    def phase(self, name: str):
+        """A context whose wall time is attributed to the named phase of the current file."""
+        return _NO_CONTEXT
+
+    def count(self, name: str, value: int):
+        """Adds `value` to the named counter of the current file."""
+
+
+class _NoContext:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_CONTEXT = _NoContext()
+
+
+@dataclass
+class FileMetrics:
+    """The measurements for one file. Phase times are in seconds."""
+    name: str
+    phases: dict = field(default_factory=dict)
+    counters: dict = field(default_factory=dict)
+
+
+class MetricsRecorder(Instrumentation):
+    """Records FileMetrics for each file processed, in order."""
+    enabled = True
+
+    def __init__(self):
+        self.files = []
+        self._current = None
+        self._depth = 0
+
+    @contextmanager
+    def file(self, name: str):
+        # nested file contexts, e.g. parse within do_semantic_analysis, share one record
+        if self._depth == 0:
+            self._current = FileMetrics(name)
+            self.files.append(self._current)
+        self._depth += 1
+        try:
+            yield self._current
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self._current = None
+
+    @contextmanager
+    def phase(self, name: str):
+        metrics = self._current_metrics()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            metrics.phases[name] = metrics.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name: str, value: int):
+        metrics = self._current_metrics()
+        metrics.counters[name] = metrics.counters.get(name, 0) + value
+
+    def _current_metrics(self):
+        if self._current is None:
+            # a measurement outside any file context gets a record of its own
+            self.files.append(FileMetrics('<source>'))
+            return self.files[-1]
+        return self._current
+
+    def totals(self) -> FileMetrics:
+        """The sums of all phase times and counters, over all files."""
+        total = FileMetrics('<total>')
+        for metrics in self.files:
+            for name, seconds in metrics.phases.items():
+                total.phases[name] = total.phases.get(name, 0.0) + seconds
+            for name, value in metrics.counters.items():
+                total.counters[name] = total.counters.get(name, 0) + value
+        return total
+
+    def to_json(self, indent=1) -> str:
+        return json.dumps({'files': [asdict(metrics) for metrics in self.files],
+                           'total': asdict(self.totals())}, indent=indent)
+
+    def to_prometheus(self, prefix='nimble') -> str:
+        """The metrics in the Prometheus text exposition format, labelled by file."""
+        phase_lines = []
+        counter_lines = {}
+        for metrics in self.files:
+            file_label = _escape_label(metrics.name)
+            for name, seconds in metrics.phases.items():
+                phase_lines.append(f'{prefix}_phase_seconds{{file="{file_label}",phase="{name}"}} {seconds:.9f}')
+            for name, value in metrics.counters.items():
+                counter_lines.setdefault(name, []).append(f'{prefix}_{name}{{file="{file_label}"}} {value}')
+        lines = [f'# HELP {prefix}_phase_seconds Wall time spent in each phase of the pipeline.',
+                 f'# TYPE {prefix}_phase_seconds gauge']
+        lines.extend(phase_lines)
+        for name, samples in counter_lines.items():
+            lines.append(f'# TYPE {prefix}_{name} gauge')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+_current = Instrumentation()
+
+
+def current() -> Instrumentation:
+    """The instrumentation that pipeline hooks currently report to."""
+    return _current
+
+
+def install(instrumentation: Instrumentation) -> Instrumentation:
+    """Makes `instrumentation` current, returning the one it replaces."""
+    global _current
+    previous, _current = _current, instrumentation
+    return previous
+
+
+@contextmanager
+def instrumented(instrumentation: Instrumentation):
+    """Makes `instrumentation` current for the duration of the context."""
+    previous = install(instrumentation)
+    try:
+        yield instrumentation
+    finally:
+        install(previous)
+
+
+def count_nodes(tree) -> int:
+    """The number of rule and terminal nodes in a parse tree."""
+    count = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if not isinstance(node, TerminalNode) and node.children:
+            stack.extend(node.children)
+    return count
+
+
+def dfa_states(*recognizer_classes) -> int:
+    """The total number of states in the shared DFAs of the given lexer and parser classes."""
+    return sum(len(dfa.states) for recognizer in recognizer_classes for dfa in recognizer.decisionsToDFA)
@@ -0,0 +1,65 @@
+"""
+The interning module makes the lexer intern identifiers as it creates them.
+
+`InterningTokenFactory` creates each `ID` token as an `IdentifierToken` carrying
+the identifier's id in a symboltable.SymbolTable, and with the table's single
+copy of the name as its text, so repeated names share one string. Install it on
+a parser's lexer to intern the identifiers of one compilation, e.g.:
+
+    symbols = SymbolTable()
+    tree = parse(source, 'script', NimbleLexer, NimbleParser, symbols=symbols)
+
+and every occurrence of a name in the tree has the same string as its text, so
+the tree holds one copy of each name, and the analyzer's scope lookups hash it
+only once.
+"""
+
+from antlr4 import Token
+from antlr4.CommonTokenFactory import CommonTokenFactory
+from antlr4.Token import CommonToken
+from nimble import NimbleLexer
+from symboltable import SymbolTable
+
+
+class IdentifierToken(CommonToken):
+    """A CommonToken for an identifier, with the identifier's id in the compilation's SymbolTable."""
+    __slots__ = ('symbolId',)
+
+    def __init__(self, source: tuple = CommonToken.EMPTY_SOURCE, type: int = None,
+                 channel: int = Token.DEFAULT_CHANNEL, start: int = -1, stop: int = -1):
+        super().__init__(source, type, channel, start, stop)
+        self.symbolId = -1
+
+    def clone(self):
+        t = IdentifierToken(self.source, self.type, self.channel, self.start, self.stop)
+        t.tokenIndex = self.tokenIndex
+        t.line = self.line
+        t.column = self.column
+        t.text = self.text
+        t.symbolId = self.symbolId
+        return t
+
+
+class InterningTokenFactory(CommonTokenFactory):
+    """Creates CommonTokens, except that ID tokens are IdentifierTokens interned in `symbols`."""
+    __slots__ = ('symbols', 'identifierType')
+
+    def __init__(self, symbols: SymbolTable, identifierType: int = NimbleLexer.ID):
+        super().__init__()
+        self.symbols = symbols
+        self.identifierType = identifierType
+
+    def create(self, source, type: int, text: str, channel: int, start: int, stop: int,
+               line: int, column: int):
+        if type != self.identifierType:
+            return super().create(source, type, text, channel, start, stop, line, column)
+        t = IdentifierToken(source, type, channel, start, stop)
+        t.line = line
+        t.column = column
+        if text is None and source[1] is not None:
+            text = source[1].getText(start, stop)
+        if text is not None:
+            symbols = self.symbols
+            t.symbolId = symbols.intern(text)
+            t.text = symbols[t.symbolId]
+        return t
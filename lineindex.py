@@ -0,0 +1,138 @@
+"""
+The lineindex module resolves character offsets in a source to line and column
+numbers on demand, so that a lexer need not track them character by character.
+
+A `LineIndex` records the offset of every line break in a source, and finds the
+line of an offset by binary search. An `OffsetToken` knows only its character
+offsets until its `line` or `column` is first read, and then resolves them with
+the `LineIndex` its token source provides. `OffsetTokenFactory` creates them;
+`scanninglexer.ScanningLexer` uses it when its `trackPositions` is False.
+"""
+
+from bisect import bisect_left
+
+from antlr4 import Token
+from antlr4.CommonTokenFactory import CommonTokenFactory
+from antlr4.Token import CommonToken
+
+
+class LineIndex:
+    """
+    The line and column of each offset in a source. The first character of the
+    source is at `first_line` and `first_column`, as when the source is an extract
+    from a larger file.
+    """
+
+    def __init__(self, source: str, first_line=1, first_column=0):
+        self.source = source
+        self.first_line = first_line
+        self.first_column = first_column
+        self.newlines = []
+        newline = source.find('\n')
+        while newline >= 0:
+            self.newlines.append(newline)
+            newline = source.find('\n', newline + 1)
+
+    def line(self, offset: int) -> int:
+        """The line of the character at `offset`. A line break belongs to the line it ends."""
+        return self.first_line + bisect_left(self.newlines, offset)
+
+    def column(self, offset: int) -> int:
+        """The column of the character at `offset`."""
+        preceding = bisect_left(self.newlines, offset)
+        if preceding == 0:
+            return self.first_column + offset
+        return offset - self.newlines[preceding - 1] - 1
+
+    def position(self, offset: int):
+        """The (line, column) of the character at `offset`."""
+        return self.line(offset), self.column(offset)
+
+
+# the storage for Token's line and column, which OffsetToken's properties wrap
+_LINE = Token.line
+_COLUMN = Token.column
+
+
+class OffsetToken(CommonToken):
+    """
+    A CommonToken whose line and column, unless set explicitly, are resolved from
+    its start offset by the LineIndex of its token source, on first use.
+    """
+    __slots__ = ()
+
+    def __init__(self, source: tuple = CommonToken.EMPTY_SOURCE, type: int = None,
+                 channel: int = Token.DEFAULT_CHANNEL, start: int = -1, stop: int = -1):
+        Token.__init__(self)
+        self.source = source
+        self.type = type
+        self.channel = channel
+        self.start = start
+        self.stop = stop
+        self.tokenIndex = -1
+
+    @property
+    def line(self):
+        line = _LINE.__get__(self)
+        if line is None:
+            line = self._resolve()[0]
+        return line
+
+    @line.setter
+    def line(self, line: int):
+        _LINE.__set__(self, line)
+
+    @property
+    def column(self):
+        column = _COLUMN.__get__(self)
+        if column is None:
+            column = self._resolve()[1]
+        return column
+
+    @column.setter
+    def column(self, column: int):
+        _COLUMN.__set__(self, column)
+
+    def _resolve(self):
+        lexer, input = self.source
+        if lexer is None or input is None or self.start < 0:
+            line, column = 0, -1
+        else:
+            line, column = lexer.getLineIndex(input).position(self.start)
+        _LINE.__set__(self, line)
+        _COLUMN.__set__(self, column)
+        return line, column
+
+    def clone(self):
+        t = OffsetToken(self.source, self.type, self.channel, self.start, self.stop)
+        t.tokenIndex = self.tokenIndex
+        t.line = self.line
+        t.column = self.column
+        t.text = self.text
+        return t
+
+
+class OffsetTokenFactory(CommonTokenFactory):
+    """
+    Creates OffsetTokens. The line and column given for tokens created by a lexer are
+    ignored in favour of the offsets; those for tokens conjured up by the parser's
+    error recovery, which have no offsets, are kept.
+    """
+    __slots__ = ()
+
+    DEFAULT = None
+
+    def create(self, source, type: int, text: str, channel: int, start: int, stop: int,
+               line: int, column: int):
+        t = OffsetToken(source, type, channel, start, stop)
+        if start < 0:
+            t.line = line
+            t.column = column
+        if text is not None:
+            t.text = text
+        elif self.copyText and source[1] is not None:
+            t.text = source[1].getText(start, stop)
+        return t
+
+
+OffsetTokenFactory.DEFAULT = OffsetTokenFactory()
@@ -1,6 +1,6 @@
 """
 The nimblesemantics module contains the logic required to perform a semantic
-analysis of any syntactically-correct Nimble program, not including function
+analysis of any syntactically-correct Nimble program, including function
 definitions and function calls.
 
 
@@ -14,7 +14,8 @@ by adding a `type` attribute to each expression node; and
 using the errorlog module.
 
 In order to do this, it is necessary to record all declared variable types in the
-`variables` dictionary.
+`variables` dictionary, and all function signatures, parameters and local variables
+in the scopes of the symboltable module.
 
 Group members: OCdt MacDonald and Brooks
 
@@ -24,7 +25,7 @@ Version: 2/27/2022
 
 from errorlog import ErrorLog, Category
 from nimble import NimbleListener, NimbleParser
-from symboltable import PrimitiveType
+from symboltable import PrimitiveType, FunctionType, Scope
 
 
 class InferTypesAndCheckConstraints(NimbleListener):
@@ -32,23 +33,36 @@ class InferTypesAndCheckConstraints(NimbleListener):
     The type of each expression parse tree node is calculated and attached to the node as a
     `type` attribute, e.g,. ctx.type = ...
 
-    The types of declared variables are stored in `self.variables`, which is a dictionary
-    mapping from variable names to symboltable.PrimitiveType instances.
+    The types of declared variables in main are stored in `self.variables`, which is a
+    dictionary mapping from variable names to symboltable.PrimitiveType instances. It is
+    the backing dictionary of `self.main_scope`.
+
+    Function signatures are defined in `self.global_scope` before any body is checked,
+    so calls may precede definitions. If an `enclosing_scope` is given, e.g., from a
+    signatureindex.SignatureIndex, functions defined in other files are resolved through
+    it when not defined in this script. Each function body is checked in its own scope,
+    attached to the FuncDefContext as `ctx.scope`. Declarations and variable references
+    are annotated with their slot index in the enclosing scope as `ctx.slot`.
 
     Any semantic errors detected, e.g., undefined variable names,
     type mismatches, etc, are logged in the `error_log`
     """
 
-    def __init__(self, error_log: ErrorLog, variables: dict):
+    def __init__(self, error_log: ErrorLog, variables: dict, enclosing_scope: Scope = None):
         self.error_log = error_log
         self.variables = variables
+        self.global_scope = Scope('$global', enclosing_scope)
+        self.main_scope = Scope('$main', self.global_scope, PrimitiveType.Void, variables)
+        self.current_scope = self.main_scope
 
     # --------------------------------------------------------
     # Program structure
-    # Deliberately left blank because the examples shown in class did not
-    # have any tests in these areas, as there is no type to assign.
     # --------------------------------------------------------
 
+    def enterScript(self, ctx: NimbleParser.ScriptContext):
+        for func_def in ctx.funcDef():
+            self.define_function(func_def)
+
     def exitScript(self, ctx: NimbleParser.ScriptContext):
         pass
 
@@ -64,6 +78,67 @@ class InferTypesAndCheckConstraints(NimbleListener):
     def exitBlock(self, ctx: NimbleParser.BlockContext):
         pass
 
+    # --------------------------------------------------------
+    # Functions
+    # --------------------------------------------------------
+
+    def define_function(self, ctx: NimbleParser.FuncDefContext):
+        """
+        Defines the signature of the function in the global scope, and creates
+        the (as yet empty) scope for its body.
+        """
+        name = ctx.ID().getText()
+        parameter_types = tuple(PrimitiveType[p.TYPE().getText()] for p in ctx.parameterDef())
+        return_type = PrimitiveType[ctx.TYPE().getText()] if ctx.TYPE() else PrimitiveType.Void
+
+        if name in self.global_scope:
+            self.error_log.add(ctx, Category.DUPLICATE_NAME,
+                               f"Function {name} has already been defined")
+        else:
+            ctx.slot = self.global_scope.define(name, FunctionType(parameter_types, return_type))
+        ctx.scope = Scope(name, self.global_scope, return_type)
+
+    def enterFuncDef(self, ctx: NimbleParser.FuncDefContext):
+        if not hasattr(ctx, 'scope'):
+            self.define_function(ctx)
+        self.current_scope = ctx.scope
+
+    def exitFuncDef(self, ctx: NimbleParser.FuncDefContext):
+        self.current_scope = self.main_scope
+
+    def exitParameterDef(self, ctx: NimbleParser.ParameterDefContext):
+        name = ctx.ID().getText()
+        ctx.type = PrimitiveType[ctx.TYPE().getText()]
+
+        if name in self.current_scope:
+            self.error_log.add(ctx, Category.DUPLICATE_NAME,
+                               f"Parameter {name} has already been defined")
+            return
+        ctx.slot = self.current_scope.define(name, ctx.type)
+
+    def exitFuncCall(self, ctx: NimbleParser.FuncCallContext):
+        name = ctx.ID().getText()
+        function_type = self.current_scope.resolve(name)
+
+        if not isinstance(function_type, FunctionType):
+            ctx.type = PrimitiveType.ERROR
+            self.error_log.add(ctx, Category.UNDEFINED_NAME,
+                               f"Function {name} has not been defined")
+            return
+
+        argument_types = tuple(arg.type for arg in ctx.expr())
+        if argument_types != function_type.parameter_types:
+            ctx.type = PrimitiveType.ERROR
+            self.error_log.add(ctx, Category.INVALID_CALL,
+                               f"{name} expects {function_type}\n\t"
+                               f"but was called with ({', '.join(str(t) for t in argument_types)})")
+            return
+
+        ctx.type = function_type.return_type
+
+    def exitFuncCallExpr(self, ctx: NimbleParser.FuncCallExprContext):
+        ctx.type = ctx.funcCall().type
+
     # --------------------------------------------------------
     # Variable declarations
     # --------------------------------------------------------
@@ -118,16 +193,26 @@ class InferTypesAndCheckConstraints(NimbleListener):
 
         newkey = str(ctx.ID())
 
-        self.variables[newkey] = ctx.type
+        if newkey in self.current_scope:
+            self.error_log.add(ctx, Category.DUPLICATE_NAME,
+                               f"{newkey} has already been declared")
+            return
 
-        # print(self.variables)
+        ctx.slot = self.current_scope.define(newkey, ctx.type)
 
     # --------------------------------------------------------
     # Statements
     # --------------------------------------------------------
 
     def exitAssignment(self, ctx: NimbleParser.AssignmentContext):
-        vartype = self.variables[str(ctx.ID())]
+        vartype = self.current_scope.resolve(str(ctx.ID()))
+
+        if vartype is None or isinstance(vartype, FunctionType):
+            ctx.type = PrimitiveType.ERROR
+            ctx.valid = False
+            self.error_log.add(ctx, Category.UNDEFINED_NAME,
+                               f"{ctx.ID()} is not a declared variable")
+            return
 
         if vartype == PrimitiveType.Int:
             if ctx.expr().type == PrimitiveType.Int:
@@ -172,7 +257,7 @@ class InferTypesAndCheckConstraints(NimbleListener):
                                f"{ctx.ID()} has previously been missassigned\n\t")
 
         newkey = str(ctx.ID())
-        self.variables[newkey] = ctx.type
+        ctx.slot = self.current_scope.define(newkey, ctx.type)
 
     def exitWhile(self, ctx: NimbleParser.WhileContext):
         if ctx.expr().type != PrimitiveType.Bool:
@@ -191,11 +276,23 @@ class InferTypesAndCheckConstraints(NimbleListener):
 
     def exitPrint(self, ctx: NimbleParser.PrintContext):
 
-        if ctx.expr().type == PrimitiveType.ERROR:
+        if ctx.expr().type in (PrimitiveType.ERROR, PrimitiveType.Void):
             ctx.type = PrimitiveType.ERROR
             self.error_log.add(ctx, Category.UNPRINTABLE_EXPRESSION,
                                f"Can't print {str(ctx.expr())} ")
 
+    def exitReturn(self, ctx: NimbleParser.ReturnContext):
+        expected = self.current_scope.return_type
+        actual = ctx.expr().type if ctx.expr() else PrimitiveType.Void
+
+        if actual == PrimitiveType.ERROR:
+            ctx.type = PrimitiveType.ERROR
+        elif actual != expected:
+            ctx.type = PrimitiveType.ERROR
+            self.error_log.add(ctx, Category.INVALID_RETURN,
+                               f"{self.current_scope.name} returns {expected}\n\t"
+                               f"you tried to return a {actual}")
+
     # --------------------------------------------------------
     # Expressions
     # --------------------------------------------------------
@@ -254,10 +351,13 @@ class InferTypesAndCheckConstraints(NimbleListener):
                                f"Can't apply {ctx.op.text} to {ctx.expr(0).type.name} and {ctx.expr(1).type.name}")
 
     def exitVariable(self, ctx: NimbleParser.VariableContext):
-        if str(ctx.ID()) in self.variables:
-            ctx.type = self.variables[str(ctx.ID())]
+        vartype = self.current_scope.resolve(str(ctx.ID()))
+        if isinstance(vartype, PrimitiveType):
+            ctx.type = vartype
+            ctx.slot = self.current_scope.slot(str(ctx.ID()))
 
         else:
+            ctx.type = PrimitiveType.ERROR
             self.error_log.add(ctx,Category.UNDEFINED_NAME,
                                f"This {str(ctx.ID())} has not been defined")
 
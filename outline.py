@@ -0,0 +1,194 @@
+"""
+The outline module extracts the top-level structure of a Nimble script, i.e.,
+the header of each `funcDef` and where `main` begins, at close to lexing speed.
+
+Rather than running NimbleParser.script(), which parses every function body, the
+scan works directly on the buffered token stream: it reads each
+
+    'func' ID '(' (parameterDef (',' parameterDef)*)? ')' ('->' TYPE)?
+
+header by hand and then skips the body by matching braces. Headers that don't
+have that form are recorded as problems, and the scan resumes at the next
+top-level 'func'; the full parse reports them properly.
+"""
+
+from dataclasses import dataclass, field
+
+from antlr4 import CommonTokenStream, FileStream, InputStream, Token
+from nimble import NimbleLexer, NimbleParser
+from symboltable import PrimitiveType, FunctionType
+
+# token types of the punctuation used in function headers
+FUNC = NimbleParser.T__0       # 'func'
+LPAREN = NimbleParser.T__1     # '('
+COMMA = NimbleParser.T__2      # ','
+RPAREN = NimbleParser.T__3     # ')'
+ARROW = NimbleParser.T__4      # '->'
+LBRACE = NimbleParser.T__5     # '{'
+RBRACE = NimbleParser.T__6     # '}'
+COLON = NimbleParser.T__7      # ':'
+
+
+@dataclass
+class FunctionHeader:
+    """
+    The header of one top-level function. `start` is the 'func' token, `body_start`
+    the opening brace and `stop` the matching closing brace, or None if the body
+    is unterminated.
+    """
+    name: str
+    function_type: FunctionType
+    parameter_names: tuple
+    start: Token
+    body_start: Token
+    stop: Token = None
+
+    @property
+    def line(self) -> int:
+        return self.start.line
+
+
+@dataclass
+class Outline:
+    """
+    The function headers of a script, in source order, and the index of the first
+    token of `main`. `problems` lists (line, message) pairs for anything the scan
+    could not make sense of; an outline with problems may be incomplete.
+    """
+    functions: list = field(default_factory=list)
+    main_start: int = 0
+    problems: list = field(default_factory=list)
+
+    def is_complete(self) -> bool:
+        return not self.problems
+
+
+def scan_outline(token_stream: CommonTokenStream) -> Outline:
+    """
+    Fills the token stream and scans its top-level function headers, skipping
+    each body by brace matching. Nothing is parsed beyond the headers. After a
+    malformed header, the scan resumes at the next 'func' outside any braces.
+    """
+    token_stream.fill()
+    tokens = token_stream.tokens
+    outline = Outline()
+    i = 0
+    while tokens[i].type == FUNC:
+        header, i = _read_header(tokens, i, outline.problems)
+        if header is None:
+            i = _skip_to_function(tokens, i)
+            continue
+        i = _skip_body(tokens, i, header, outline.problems)
+        outline.functions.append(header)
+        if header.stop is None:
+            break
+    outline.main_start = i
+    return outline
+
+
+def scan_file(source_or_path, from_file=False) -> Outline:
+    """Lexes the source or source file and returns its outline."""
+    character_stream = FileStream(source_or_path) if from_file else InputStream(source_or_path)
+    lexer = NimbleLexer(character_stream)
+    lexer.removeErrorListeners()
+    return scan_outline(CommonTokenStream(lexer))
+
+
+def _read_header(tokens, i, problems):
+    """
+    Reads a function header starting at the 'func' token tokens[i]. Returns the
+    header, or None if it is malformed, and the index of the token following it.
+    """
+    start = tokens[i]
+
+    def expect(ttype):
+        return tokens[i].type == ttype
+
+    i += 1
+    if not expect(NimbleParser.ID):
+        problems.append((start.line, "expected function name after 'func'"))
+        return None, i
+    name = tokens[i].text
+    i += 1
+    if not expect(LPAREN):
+        problems.append((start.line, f"expected '(' after {name}"))
+        return None, i
+    i += 1
+
+    parameter_names = []
+    parameter_types = []
+    while expect(NimbleParser.ID):
+        parameter_names.append(tokens[i].text)
+        i += 1
+        if not expect(COLON):
+            problems.append((start.line, f"expected ':' after parameter {parameter_names[-1]}"))
+            return None, i
+        i += 1
+        if not expect(NimbleParser.TYPE):
+            problems.append((start.line, f"expected type of parameter {parameter_names[-1]}"))
+            return None, i
+        parameter_types.append(PrimitiveType[tokens[i].text])
+        i += 1
+        if not expect(COMMA):
+            break
+        i += 1
+    if not expect(RPAREN):
+        problems.append((start.line, f"expected ')' to close the parameters of {name}"))
+        return None, i
+    i += 1
+
+    return_type = PrimitiveType.Void
+    if expect(ARROW):
+        i += 1
+        if not expect(NimbleParser.TYPE):
+            problems.append((start.line, f"expected return type of {name}"))
+            return None, i
+        return_type = PrimitiveType[tokens[i].text]
+        i += 1
+    if not expect(LBRACE):
+        problems.append((start.line, f"expected '{{' to open the body of {name}"))
+        return None, i
+
+    function_type = FunctionType(tuple(parameter_types), return_type)
+    return FunctionHeader(name, function_type, tuple(parameter_names), start, tokens[i]), i
+
+
+def _skip_to_function(tokens, i):
+    """
+    Skips from tokens[i], within a malformed header, to the next 'func' outside any
+    braces, or to the EOF. Returns the index of that token.
+    """
+    depth = 0
+    while tokens[i].type != Token.EOF:
+        ttype = tokens[i].type
+        if ttype == LBRACE:
+            depth += 1
+        elif ttype == RBRACE:
+            depth = max(depth - 1, 0)
+        elif ttype == FUNC and depth == 0:
+            break
+        i += 1
+    return i
+
+
+def _skip_body(tokens, i, header, problems):
+    """
+    Skips from the opening brace at tokens[i] to its matching closing brace, recording
+    it as the header's stop. Returns the index of the token following the body.
+    """
+    depth = 0
+    n = len(tokens)
+    while i < n:
+        ttype = tokens[i].type
+        if ttype == LBRACE:
+            depth += 1
+        elif ttype == RBRACE:
+            depth -= 1
+            if depth == 0:
+                header.stop = tokens[i]
+                return i + 1
+        elif ttype == Token.EOF:
+            break
+        i += 1
+    problems.append((header.line, f"body of {header.name} is not closed"))
+    return i
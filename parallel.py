@@ -0,0 +1,252 @@
+"""
+The parallel module spreads the work of analyzing a single large Nimble script
+across a pool of worker processes.
+
+Once the signatures of all functions are known (from the header-only scan of
+the outline module), each function body can be type-checked independently of
+the others. `analyze_in_parallel` splits a script into one work unit per
+`funcDef`, checks the units concurrently, analyzes `main` in the calling
+process, and merges the resulting error logs in source order, so the result is
+the same as a sequential analysis regardless of how the work was scheduled.
+
+`parse_in_parallel` likewise parses each `funcDef` in a worker process. A
+worker returns the shape of its tree, as nested tuples of token indices, rather
+than the tree itself, whose contexts and tokens can't be sent between
+processes; the calling process then parses `main` with a parser that rebuilds
+each function's tree from its shape in place of parsing it, and so reassembles
+the same ScriptContext as `parse` would.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+from antlr4 import CommonTokenStream, InputStream, ParserRuleContext, ParseTreeWalker, TerminalNode, Token
+from errorlog import ErrorLog
+from generic_parser import parse, SyntaxErrors, SyntaxErrorLog, SyntaxErrorRecord
+from nimble import NimbleLexer, NimbleParser
+from nimblesemantics import InferTypesAndCheckConstraints
+from outline import scan_outline
+from symboltable import Scope
+
+
+def analyze(source):
+    """
+    Sequential semantic analysis of a complete script. Returns the error log and the
+    variables of main. Raises SyntaxErrors if the script doesn't parse.
+    """
+    tree = parse(source, 'script', NimbleLexer, NimbleParser)
+    errors = ErrorLog()
+    variables = {}
+    ParseTreeWalker().walk(InferTypesAndCheckConstraints(errors, variables), tree)
+    return errors, variables
+
+
+def analyze_in_parallel(source, max_workers=None, min_functions=2):
+    """
+    Semantic analysis of a complete script, checking function bodies concurrently in
+    up to `max_workers` processes. Returns the error log and the variables of main,
+    as `analyze` does, and likewise raises SyntaxErrors if the script doesn't parse.
+
+    Falls back to sequential analysis when the script has fewer than `min_functions`
+    functions, or when its outline can't be determined.
+    """
+    lexer = NimbleLexer(InputStream(source))
+    lexer.removeErrorListeners()
+    outline = scan_outline(CommonTokenStream(lexer))
+    if not outline.is_complete() or len(outline.functions) < min_functions:
+        return analyze(source)
+
+    signatures = Scope('$script')
+    units = []
+    for header in outline.functions:
+        duplicate = header.name in signatures
+        if not duplicate:
+            signatures.define(header.name, header.function_type)
+        units.append(_FunctionUnit(source[header.start.start:header.stop.stop + 1],
+                                   header.start.line, header.start.column, duplicate))
+    for unit in units:
+        unit.signatures = signatures
+
+    workers = max_workers or os.cpu_count() or 1
+    chunk_size = max(1, len(units) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_analyze_function, units, chunksize=chunk_size))
+
+    errors = ErrorLog()
+    syntax_errors = []
+    for entries, unit_syntax_errors in results:
+        for entry in entries:
+            errors.add_entry(entry)
+        syntax_errors.extend(unit_syntax_errors)
+
+    main_start = outline.functions[-1].stop.stop + 1
+    main_first = lexer_position(source, main_start)
+    variables = {}
+    try:
+        tree = parse(source[main_start:], 'script', NimbleLexer, NimbleParser,
+                     line=main_first[0], column=main_first[1])
+        ParseTreeWalker().walk(InferTypesAndCheckConstraints(errors, variables, signatures), tree)
+    except SyntaxErrors as e:
+        syntax_errors.extend((r.line, r.column, r.message) for r in e.error_log.syntax_errors)
+
+    if syntax_errors:
+        error_log = SyntaxErrorLog()
+        for line, column, message in sorted(syntax_errors):
+            error_log.syntax_errors.append(SyntaxErrorRecord(None, None, line, column, message, None))
+        raise SyntaxErrors(error_log, None)
+    return errors, variables
+
+
+def parse_in_parallel(source, max_workers=None, min_functions=2):
+    """
+    Parses a complete script, parsing its functions concurrently in up to `max_workers`
+    processes. Returns the same ScriptContext as `parse`, with the same tokens, and
+    likewise raises SyntaxErrors if the script doesn't parse.
+
+    Falls back to `parse` when the script has fewer than `min_functions` functions,
+    when its outline can't be determined, or when there is any syntax error, so that
+    errors are reported exactly as by a sequential parse.
+    """
+    lexer = NimbleLexer(InputStream(source))
+    lexer.removeErrorListeners()
+    error_log = SyntaxErrorLog()
+    lexer.addErrorListener(error_log)
+    token_stream = CommonTokenStream(lexer)
+    outline = scan_outline(token_stream)
+    if error_log.has_errors() or not outline.is_complete() or len(outline.functions) < min_functions:
+        return parse(source, 'script', NimbleLexer, NimbleParser)
+
+    units = [_FunctionUnit(source[header.start.start:header.stop.stop + 1],
+                           header.start.line, header.start.column, False)
+             for header in outline.functions]
+    workers = max_workers or os.cpu_count() or 1
+    chunk_size = max(1, len(units) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        shapes = list(executor.map(_parse_function, units, chunksize=chunk_size))
+    if any(shape is None for shape in shapes):
+        return parse(source, 'script', NimbleLexer, NimbleParser)
+
+    parser = _ReassemblingParser(token_stream, [(shape, header.start.tokenIndex)
+                                                for shape, header in zip(shapes, outline.functions)])
+    parser.removeErrorListeners()
+    parser.addErrorListener(error_log)
+    tree = parser.script()
+    if error_log.has_errors():
+        return parse(source, 'script', NimbleLexer, NimbleParser)
+    return tree
+
+
+def lexer_position(source, index):
+    """The (line, column) of the character at `index`, as the lexer would report it."""
+    line = source.count('\n', 0, index) + 1
+    return line, index - (source.rfind('\n', 0, index) + 1)
+
+
+class _FunctionUnit:
+    """The work unit for one funcDef: its source, where it starts, and the script's signatures."""
+
+    def __init__(self, source, line, column, duplicate):
+        self.source = source
+        self.line = line
+        self.column = column
+        self.duplicate = duplicate
+        self.signatures = None
+
+
+def _analyze_function(unit: _FunctionUnit):
+    """
+    Parses and checks one funcDef in a worker process. Returns the detached error
+    entries and any syntax errors as (line, column, message) triples.
+    """
+    try:
+        tree = parse(unit.source, 'funcDef', NimbleLexer, NimbleParser,
+                     line=unit.line, column=unit.column)
+    except SyntaxErrors as e:
+        return [], [(r.line, r.column, r.message) for r in e.error_log.syntax_errors]
+
+    errors = ErrorLog()
+    analyzer = InferTypesAndCheckConstraints(errors, {}, unit.signatures)
+    if unit.duplicate:
+        # make the earlier definition visible so this one is reported, as in a sequential walk
+        name = tree.ID().getText()
+        analyzer.global_scope.define(name, unit.signatures.resolve(name))
+    ParseTreeWalker().walk(analyzer, tree)
+    return [entry.detach() for entry in errors.entries()], []
+
+
+def _parse_function(unit: _FunctionUnit):
+    """Parses one funcDef in a worker process. Returns the shape of its tree, or None if it has syntax errors."""
+    try:
+        tree = parse(unit.source, 'funcDef', NimbleLexer, NimbleParser,
+                     line=unit.line, column=unit.column)
+    except SyntaxErrors:
+        return None
+    return tree_shape(tree)
+
+
+# context class <-> index in the shape of a tree
+_CONTEXT_CLASSES = sorted((c for c in vars(NimbleParser).values()
+                           if isinstance(c, type) and issubclass(c, ParserRuleContext)),
+                          key=lambda c: c.__name__)
+_CONTEXT_IDS = {c: i for i, c in enumerate(_CONTEXT_CLASSES)}
+
+
+def tree_shape(ctx: ParserRuleContext):
+    """
+    The shape of an error-free parse tree, as nested tuples of ints: for each context,
+    its class, invoking state, start and stop token indices, labelled tokens (e.g.,
+    `op`) and children, where a terminal child is just its token index.
+    """
+    labels = tuple((name, _token_index(token)) for name, token in getattr(ctx, '__dict__', {}).items())
+    children = tuple(child.symbol.tokenIndex if isinstance(child, TerminalNode) else tree_shape(child)
+                     for child in ctx.getChildren())
+    return (_CONTEXT_IDS[type(ctx)], ctx.invokingState, _token_index(ctx.start), _token_index(ctx.stop),
+            labels, children)
+
+
+def _token_index(token: Token):
+    return None if token is None else token.tokenIndex
+
+
+class _ReassemblingParser(NimbleParser):
+    """
+    A NimbleParser whose funcDef rule, rather than parsing each function, rebuilds
+    the next of the given (shape, first token index) pairs in its place, on this
+    parser's own tokens, and skips past it. Once the shapes run out, as when error
+    recovery finds more functions than the outline did, functions are parsed as usual.
+    """
+
+    def __init__(self, input, functions):
+        super().__init__(input)
+        self.functions = iter(functions)
+
+    def funcDef(self):
+        function = next(self.functions, None)
+        if function is None:
+            return super().funcDef()
+        shape, offset = function
+        ctx = self.rebuild(shape, self._ctx, offset)
+        ctx.invokingState = self.state
+        self._ctx.addChild(ctx)
+        self._input.seek(ctx.stop.tokenIndex + 1)
+        return ctx
+
+    def rebuild(self, shape, parent, offset):
+        class_id, invoking_state, start, stop, labels, children = shape
+        context_class = _CONTEXT_CLASSES[class_id]
+        ctx = context_class.__new__(context_class)
+        ParserRuleContext.__init__(ctx, parent, invoking_state)
+        ctx.parser = self
+        ctx.start = self.shifted_token(start, offset)
+        ctx.stop = self.shifted_token(stop, offset)
+        for name, index in labels:
+            setattr(ctx, name, self.shifted_token(index, offset))
+        for child in children:
+            if isinstance(child, int):
+                ctx.addTokenNode(self._input.get(child + offset))
+            else:
+                ctx.addChild(self.rebuild(child, ctx, offset))
+        return ctx
+
+    def shifted_token(self, index, offset):
+        return None if index is None else self._input.get(index + offset)
@@ -0,0 +1,105 @@
+"""
+The predictioncache module bounds, measures and clears the prediction caches
+shared by every NimbleLexer and NimbleParser in a process: the DFA built up for
+each lexer mode and parser decision, and the parser's PredictionContextCache.
+
+Left alone, these caches grow for the lifetime of the process as new input
+exercises new lookahead paths. A long-running service can cap them, e.g.:
+
+    limit_caches(max_dfa_states=2000, max_context_entries=50000)
+
+which evicts the least recently used prediction contexts beyond the limit, and
+starts a decision's DFA afresh whenever it exceeds the limit; or it can clear
+them periodically, e.g. after each batch of files:
+
+    trim_caches(max_bytes=64 * 1024 * 1024)
+
+Clearing is safe while other threads are parsing: each DFA is replaced rather
+than emptied, so a prediction in progress completes with the DFA it started with.
+"""
+
+from dataclasses import dataclass, asdict
+import sys
+
+from antlr4.atn.ATNConfig import ATNConfig
+from antlr4.atn.LexerATNSimulator import LexerATNSimulator
+from antlr4.atn.ParserATNSimulator import ParserATNSimulator
+from antlr4.atn.ATNState import BasicState
+from antlr4.dfa.DFA import DFA
+from nimble import NimbleLexer, NimbleParser
+
+RECOGNIZERS = (NimbleLexer, NimbleParser)
+
+
+@dataclass
+class CacheUsage:
+    """A snapshot of the size of the shared prediction caches."""
+    dfa_states: int
+    dfa_edges: int
+    dfa_bytes: int
+    context_entries: int
+    context_bytes: int
+    context_hits: int
+    context_misses: int
+    context_evictions: int
+
+    @property
+    def total_bytes(self) -> int:
+        return self.dfa_bytes + self.context_bytes
+
+    def as_dict(self) -> dict:
+        return dict(asdict(self), total_bytes=self.total_bytes)
+
+
+def limit_caches(max_dfa_states: int = None, max_context_entries: int = None):
+    """
+    Caps the number of states in each DFA, and the number of entries in the parser's
+    prediction context cache. None removes the corresponding limit.
+    """
+    ParserATNSimulator.maxDFAStates = max_dfa_states
+    LexerATNSimulator.maxDFAStates = max_dfa_states
+    NimbleParser.sharedContextCache.maxSize = max_context_entries
+
+
+def cache_usage() -> CacheUsage:
+    """Counts the entries in the shared caches and estimates the memory they use."""
+    config_size = sys.getsizeof(ATNConfig(BasicState(), 1))
+    states = edges = dfa_bytes = 0
+    for recognizer in RECOGNIZERS:
+        for dfa in recognizer.decisionsToDFA:
+            # other threads may be adding states; each state's edges are only ever
+            # filled in, so they can be counted outside the lock
+            with dfa.lock:
+                dfa_states = list(dfa.states)
+            for state in dfa_states:
+                states += 1
+                dfa_bytes += sys.getsizeof(state)
+                if state.edges is not None:
+                    edges += sum(1 for edge in state.edges if edge is not None)
+                    dfa_bytes += sys.getsizeof(state.edges)
+                if state.sparseEdges is not None:
+                    edges += len(state.sparseEdges)
+                    dfa_bytes += sys.getsizeof(state.sparseEdges)
+                if state.configs is not None:
+                    dfa_bytes += sys.getsizeof(state.configs.configs) + len(state.configs) * config_size
+    contexts = NimbleParser.sharedContextCache
+    with contexts.lock:
+        return CacheUsage(states, edges, dfa_bytes, len(contexts), contexts.approximateBytes,
+                          contexts.hits, contexts.misses, contexts.evictions)
+
+
+def clear_caches():
+    """Starts every shared DFA afresh, and empties the prediction context cache and its counters."""
+    for recognizer in RECOGNIZERS:
+        dfas = recognizer.decisionsToDFA
+        for i, dfa in enumerate(dfas):
+            dfas[i] = DFA(dfa.atnStartState, dfa.decision)
+    NimbleParser.sharedContextCache.clear()
+
+
+def trim_caches(max_bytes: int) -> bool:
+    """Clears the caches if they use more than about `max_bytes`; returns True if cleared."""
+    if cache_usage().total_bytes <= max_bytes:
+        return False
+    clear_caches()
+    return True
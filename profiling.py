@@ -0,0 +1,95 @@
+"""
+The profiling module reports where the parser spends its time predicting, by
+grammar decision and by the Nimble rule each decision belongs to.
+
+`profile_parse` parses a source with a ProfilingATNSimulator installed and
+returns a DecisionProfile for each decision that was predicted at least once:
+how often, for how long, how far it had to look ahead, and how each prediction
+was answered: by the LL(1) table, by the cached DFA, by SLL simulation of the
+ATN, or by escalating to full-context (LL) prediction. For example:
+
+    python profiling.py big_script.nimble
+"""
+
+from dataclasses import dataclass
+import sys
+
+from antlr4 import CommonTokenStream, FileStream, InputStream
+from nimble import NimbleLexer, NimbleParser
+
+
+@dataclass
+class DecisionProfile:
+    """Prediction statistics for one decision. Times are in milliseconds."""
+    rule: str
+    decision: int
+    invocations: int
+    time: float
+    ll1_predictions: int
+    dfa_transitions: int
+    atn_transitions: int
+    full_context_fallbacks: int
+    full_context_transitions: int
+    max_lookahead: int
+    mean_lookahead: float
+    errors: int
+
+
+def profile_parse(source_or_path, start_rule_name='script', parser_class=NimbleParser,
+                  from_file=False):
+    """
+    Parses the source or source file from the given rule with prediction profiling
+    enabled. Returns the parse tree and the profiles of the decisions that were
+    predicted, most time-consuming first. Syntax errors are not reported.
+    """
+    character_stream = FileStream(source_or_path) if from_file else InputStream(source_or_path)
+    lexer = NimbleLexer(character_stream)
+    parser = parser_class(CommonTokenStream(lexer))
+    lexer.removeErrorListeners()
+    parser.removeErrorListeners()
+    parser.setProfile(True)
+    tree = getattr(parser, start_rule_name)()
+
+    profiles = []
+    for info in parser.getParseInfo():
+        if info.invocations == 0:
+            continue
+        rule_index = parser.atn.decisionToState[info.decision].ruleIndex
+        profiles.append(DecisionProfile(
+            parser.ruleNames[rule_index], info.decision, info.invocations,
+            info.timeInPrediction / 1e6, info.LL1_Predictions,
+            info.SLL_DFATransitions, info.SLL_ATNTransitions,
+            info.LL_Fallback, info.LL_ATNTransitions,
+            max(info.SLL_MaxLook, info.LL_MaxLook),
+            info.SLL_TotalLook / info.invocations, info.errors))
+    profiles.sort(key=lambda p: p.time, reverse=True)
+    return tree, profiles
+
+
+def profile_by_rule(profiles) -> dict:
+    """Totals the decision profiles of each rule: rule name -> (invocations, time)."""
+    totals = {}
+    for p in profiles:
+        invocations, time = totals.get(p.rule, (0, 0.0))
+        totals[p.rule] = (invocations + p.invocations, time + p.time)
+    return dict(sorted(totals.items(), key=lambda item: item[1][1], reverse=True))
+
+
+def format_profile(profiles) -> str:
+    lines = [f"{'rule':12} {'decision':>8} {'calls':>8} {'ms':>9} {'LL(1)':>7} {'DFA':>8} "
+             f"{'ATN':>6} {'LL':>5} {'max k':>5} {'mean k':>6}"]
+    for p in profiles:
+        lines.append(f'{p.rule:12} {p.decision:8} {p.invocations:8} {p.time:9.2f} {p.ll1_predictions:7} '
+                     f'{p.dfa_transitions:8} {p.atn_transitions:6} {p.full_context_fallbacks:5} '
+                     f'{p.max_lookahead:5} {p.mean_lookahead:6.2f}')
+    lines.append('')
+    for rule, (invocations, time) in profile_by_rule(profiles).items():
+        lines.append(f'{rule:12} {invocations:8} predictions {time:9.2f} ms')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    for path in sys.argv[1:]:
+        _, decision_profiles = profile_parse(path, from_file=True)
+        print(path)
+        print(format_profile(decision_profiles))
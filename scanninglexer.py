@@ -0,0 +1,163 @@
+"""
+The scanninglexer module provides a Nimble lexer that scans string literals,
+whitespace and comments directly, rather than character by character through
+the lexer DFA.
+
+`STRING` and `COMMENT` are the two Nimble tokens that can be arbitrarily long,
+and both are easy to recognize without the ATN: a string runs to the first
+double quote that is not escaped, and a comment to the end of the line. Before
+matching each token, the `ScanningLexer`'s simulator checks whether the next
+character is `"`, `/` or whitespace and, if so, matches the whole string, or
+the whole run of whitespace and comments, with a regular expression over the
+source text. Anything the expressions don't match (an unterminated or invalid
+string, or a lone `/`) is left to the generated lexer, so tokens, positions
+and error reports are exactly those of `NimbleLexer`. For example:
+
+    tree = parse(source, 'script', ScanningLexer, NimbleParser)
+
+An `OffsetScanningLexer` leaves out the tracking of line and column for each
+character consumed; its tokens find their line and column from a `LineIndex`
+of the source if and when they are needed, e.g. for an error report.
+
+Whitespace and comments are skipped, so by default (`elideSkipped`) the lexer
+consumes them before it even starts on the next token. While instrumentation
+is enabled, the time spent doing so is reported as the `lex_skipped` phase,
+along with a count of `skipped_chars`.
+"""
+
+import re
+import sys
+from typing import TextIO
+
+from antlr4 import Lexer, Token
+from antlr4.PredictionContext import PredictionContextCache
+from antlr4.atn.LexerATNSimulator import LexerATNSimulator
+import instrumentation
+from lineindex import LineIndex, OffsetTokenFactory
+from nimble import NimbleLexer
+
+# STRING : '"' ( SINGLE_CHAR | ESCAPED_CHAR )*? '"', where SINGLE_CHAR is ' '..'[' | ']'..'~'
+# The non-greedy loop ends at the first quote that isn't part of an escape.
+_STRING = re.compile(r'"(?:[ !#-\[\]-~]|\\[abfnrtv\'"\\?])*"')
+
+# WS : [ \t\r\n]+ -> skip and COMMENT : '//' ~[\r\n]* -> skip, repeated
+_SKIPPED = re.compile(r'(?:[ \t\r\n]+|//[^\r\n]*)+')
+_SKIPPED_START = frozenset(' \t\r\n/')
+
+
+class ScanningLexer(NimbleLexer):
+    """A NimbleLexer that scans STRING, WS and COMMENT tokens with regular expressions."""
+
+    # When True, each run of whitespace and comments before a token is consumed in
+    # one step, without the setup the lexer does for every token it matches.
+    elideSkipped = True
+
+    # When False, the lexer doesn't track the line and column of each character
+    # it consumes; its tokens are OffsetTokens, which resolve their line and
+    # column from the lexer's LineIndex of the source when first asked.
+    trackPositions = True
+
+    def __init__(self, input=None, output: TextIO = sys.stdout):
+        super().__init__(input, output)
+        if self.trackPositions:
+            simulator_class = ScanningLexerATNSimulator
+        else:
+            simulator_class = OffsetScanningLexerATNSimulator
+            self._factory = OffsetTokenFactory.DEFAULT
+        self._interp = simulator_class(self, self.atn, self.decisionsToDFA, PredictionContextCache())
+        self._hooks = instrumentation.current()
+        self._lineIndex = None
+
+    def nextToken(self):
+        if self.elideSkipped and not self._hitEOF and self._mode == self.DEFAULT_MODE:
+            if self._hooks.enabled:
+                with self._hooks.phase('lex_skipped'):
+                    skipped = self._interp.skipIgnored(self._input)
+                self._hooks.count('skipped_chars', skipped)
+            else:
+                skipped = self._interp.skipIgnored(self._input)
+            if skipped and self._input.LA(1) == Token.EOF:
+                self._hitEOF = True
+        return super().nextToken()
+
+    def getLineIndex(self, input) -> LineIndex:
+        """The LineIndex of the input, which must be this lexer's current or previous input."""
+        index = self._lineIndex
+        if index is None or index.source is not input.strdata:
+            # without position tracking, the simulator's line and column stay at
+            # those of the first character
+            index = self._lineIndex = LineIndex(input.strdata, self._interp.line, self._interp.column)
+        return index
+
+    def notifyListeners(self, e):
+        if not self.trackPositions:
+            self._tokenStartLine, self._tokenStartColumn = \
+                self.getLineIndex(self._input).position(self._tokenStartCharIndex)
+        super().notifyListeners(e)
+
+
+class OffsetScanningLexer(ScanningLexer):
+    """A ScanningLexer whose tokens resolve their line and column on demand."""
+    trackPositions = False
+
+
+class ScanningLexerATNSimulator(LexerATNSimulator):
+    """Matches strings, whitespace and comments by scanning, and all other tokens by DFA/ATN simulation."""
+
+    trackPositions = True
+
+    def match(self, input, mode: int):
+        if mode == Lexer.DEFAULT_MODE:
+            source = getattr(input, 'strdata', None)
+            if source is not None:
+                index = input.index
+                next_char = source[index:index + 1]
+                if next_char == '"':
+                    scanned = _STRING.match(source, index)
+                    if scanned is not None:
+                        self.mode = mode
+                        self.startIndex = index
+                        if self.trackPositions:
+                            self.column += scanned.end() - index
+                        input.seek(scanned.end())
+                        return NimbleLexer.STRING
+                elif next_char in _SKIPPED_START and self.skipIgnored(input):
+                    self.recog.skip()
+                    return NimbleLexer.WS
+        return super().match(input, mode)
+
+    def skipIgnored(self, input) -> int:
+        """
+        Consumes the run of whitespace and comments, if any, at the current index of
+        the input, tracking line and column. Returns the number of characters consumed.
+        """
+        source = getattr(input, 'strdata', None)
+        if source is None:
+            return 0
+        index = input.index
+        if source[index:index + 1] not in _SKIPPED_START:
+            return 0
+        skipped = _SKIPPED.match(source, index)
+        if skipped is None:
+            return 0
+        end = skipped.end()
+        if self.trackPositions:
+            last_newline = source.rfind('\n', index, end)
+            if last_newline < 0:
+                self.column += end - index
+            else:
+                self.line += source.count('\n', index, end)
+                self.column = end - last_newline - 1
+        self.mode = Lexer.DEFAULT_MODE
+        self.startIndex = index
+        input.seek(end)
+        return end - index
+
+
+class OffsetScanningLexerATNSimulator(ScanningLexerATNSimulator):
+    """A ScanningLexerATNSimulator that leaves line and column at those of the first character."""
+
+    trackPositions = False
+
+    def consume(self, input):
+        input.consume()
@@ -0,0 +1,251 @@
+"""
+The sharedtokens module keeps the tokens of a Nimble source in shared memory,
+so that the processes of a multi-process pipeline can hand them on without
+pickling a CommonToken per token.
+
+A `SharedTokenBuffer` is one multiprocessing.shared_memory block holding a
+header, a fixed-width record per token (its type, channel, start, stop, line and
+column) and the source text, at a fixed width per character so that any token's
+text can be sliced straight out of the block. Any process can attach to it by
+name. `lex_to_shared` lexes a source into a new buffer in chunks, in worker
+processes that each write their chunk's records in place; a parser in any
+process reads them through a `SharedTokenSource`, e.g.:
+
+    buffer, errors = lex_to_shared(source)
+    with buffer:
+        ...  # hand buffer.name to the workers, and wait for them
+        buffer.unlink()
+
+and, in a worker:
+
+    with SharedTokenBuffer.attach(name) as buffer:
+        parser = NimbleParser(CommonTokenStream(SharedTokenSource(buffer)))
+        tree = parser.script()
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
+import struct
+
+from antlr4 import InputStream, Token
+from antlr4.CommonTokenFactory import CommonTokenFactory
+from antlr4.Lexer import TokenSource
+from antlr4.Token import CommonToken
+from chunkedlexer import ErrorCollector, split_at_newlines
+from nimble import NimbleLexer
+
+# character width -> codec storing every character of a source in that many bytes,
+# given the 'surrogatepass' error handler for any lone surrogates
+_CODECS = {1: 'latin-1', 2: 'utf-16-le', 4: 'utf-32-le'}
+
+
+class SharedTokenBuffer:
+    """
+    Token records and source text in a shared memory block. The block's creator
+    owns it and should `unlink` it when every process is done with it; each process
+    should `close` its own view of it, e.g., by using the buffer as a context manager.
+    """
+
+    HEADER = struct.Struct('<4q')  # token count, record capacity, text length, character width
+    RECORD = struct.Struct('<6i')  # type, channel, start, stop, line, column
+
+    def __init__(self, memory: shared_memory.SharedMemory):
+        self.memory = memory
+        self.buf = memory.buf
+        _, self.capacity, self.text_length, self.width = self.HEADER.unpack_from(self.buf, 0)
+        self.text_offset = self.HEADER.size + self.capacity * self.RECORD.size
+        self.codec = _CODECS[self.width]
+
+    @classmethod
+    def create(cls, source: str, capacity: int = None):
+        """
+        A new buffer holding the source text and room for `capacity` tokens. The default
+        capacity, one token per character and an EOF, is as many as a source can lex to;
+        on Linux, pages of the block that are never written take no memory.
+        """
+        if capacity is None:
+            capacity = len(source) + 1
+        widest = max(map(ord, source), default=0)
+        width = 1 if widest < 0x100 else 2 if widest < 0x10000 else 4
+        size = cls.HEADER.size + capacity * cls.RECORD.size + len(source) * width
+        memory = shared_memory.SharedMemory(create=True, size=max(1, size))
+        cls.HEADER.pack_into(memory.buf, 0, 0, capacity, len(source), width)
+        buffer = cls(memory)
+        text = source.encode(buffer.codec, 'surrogatepass')
+        buffer.buf[buffer.text_offset:buffer.text_offset + len(text)] = text
+        return buffer
+
+    @classmethod
+    def attach(cls, name: str):
+        """The existing buffer of the given name."""
+        return cls(shared_memory.SharedMemory(name=name))
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    @property
+    def count(self) -> int:
+        """The number of tokens in the buffer."""
+        return self.HEADER.unpack_from(self.buf, 0)[0]
+
+    @count.setter
+    def count(self, count: int):
+        struct.pack_into('<q', self.buf, 0, count)
+
+    def __len__(self):
+        return self.count
+
+    def record(self, index: int):
+        """The (type, channel, start, stop, line, column) of the token at `index`."""
+        return self.RECORD.unpack_from(self.buf, self.HEADER.size + index * self.RECORD.size)
+
+    def write(self, index: int, ttype, channel, start, stop, line, column):
+        """Writes the record of the token at `index`; the count is left unchanged."""
+        self.RECORD.pack_into(self.buf, self.HEADER.size + index * self.RECORD.size,
+                              ttype, channel, start, stop, line, column)
+
+    def move(self, source_index: int, index: int, count: int):
+        """Moves `count` records from `source_index` down to `index`."""
+        size = self.RECORD.size
+        source_offset = self.HEADER.size + source_index * size
+        offset = self.HEADER.size + index * size
+        self.buf[offset:offset + count * size] = bytes(self.buf[source_offset:source_offset + count * size])
+
+    def text(self, start: int, stop: int) -> str:
+        """The source text from character `start` to `stop`, inclusive."""
+        stop = min(stop, self.text_length - 1)
+        if stop < start:
+            return ''
+        return str(self.buf[self.text_offset + start * self.width:self.text_offset + (stop + 1) * self.width],
+                   self.codec, 'surrogatepass')
+
+    def close(self):
+        self.buf = None
+        self.memory.close()
+
+    def unlink(self):
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def lex_to_shared(source, lexer_class=NimbleLexer, max_workers=None, min_chunk_size=1 << 16):
+    """
+    Lexes the source into a new SharedTokenBuffer, in chunks of at least `min_chunk_size`
+    characters lexed by up to `max_workers` processes, as chunkedlexer.lex_in_parallel
+    does. Returns the buffer, which the caller owns, and any lexer errors as (line, column,
+    message) triples.
+
+    Each chunk's records are written at the record index of its first character, which
+    no earlier chunk can reach, and then moved down to follow the previous chunk's.
+    """
+    buffer = SharedTokenBuffer.create(source)
+    try:
+        workers = max_workers or os.cpu_count() or 1
+        chunk_count = min(workers * 4, len(source) // max(1, min_chunk_size)) if workers > 1 else 1
+        chunks = split_at_newlines(source, chunk_count)
+        if len(chunks) == 1:
+            results = [_lex_chunk_into(buffer.name, *chunks[0], lexer_class)]
+        else:
+            names = [buffer.name] * len(chunks)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_lex_chunk_into, names, *zip(*chunks), [lexer_class] * len(chunks)))
+
+        count = 0
+        errors = []
+        last = len(chunks) - 1
+        for i, ((start, _, _), (written, chunk_errors)) in enumerate(zip(chunks, results)):
+            # every chunk but the last ends with an EOF that isn't the end of the source
+            if i < last:
+                written -= 1
+            buffer.move(start, count, written)
+            count += written
+            errors.extend(chunk_errors)
+        buffer.count = count
+    except BaseException:
+        # the caller never gets the buffer, so nothing else can release it
+        buffer.close()
+        buffer.unlink()
+        raise
+    return buffer, errors
+
+
+def _lex_chunk_into(name, start, stop, line, lexer_class=NimbleLexer):
+    """
+    Lexes the characters from `start` to `stop` (exclusive) of the named buffer's text,
+    and writes their tokens, including the chunk's EOF, from record index `start`.
+    Returns the number of records written and the lexer errors.
+    """
+    with SharedTokenBuffer.attach(name) as buffer:
+        lexer = lexer_class(InputStream(buffer.text(start, stop - 1)))
+        lexer.line = line
+        lexer.removeErrorListeners()
+        errors = ErrorCollector()
+        lexer.addErrorListener(errors)
+        index = start
+        while True:
+            token = lexer.nextToken()
+            buffer.write(index, token.type, token.channel, token.start + start, token.stop + start,
+                         token.line, token.column)
+            index += 1
+            if token.type == Token.EOF:
+                return index - start, errors.errors
+
+
+class SharedTokenSource(TokenSource):
+    """
+    A token source reading the records of a SharedTokenBuffer, creating each token
+    only when it is requested. Token text is sliced from the buffer's source text.
+    """
+
+    def __init__(self, buffer: SharedTokenBuffer):
+        self.buffer = buffer
+        self.text = SharedText(buffer)
+        self.pos = 0
+        self._factory = CommonTokenFactory.DEFAULT
+
+    @property
+    def inputStream(self):
+        return self.text
+
+    @property
+    def line(self):
+        return self.buffer.record(min(self.pos, self.buffer.count - 1))[4]
+
+    @property
+    def column(self):
+        return self.buffer.record(min(self.pos, self.buffer.count - 1))[5]
+
+    def nextToken(self):
+        ttype, channel, start, stop, line, column = self.buffer.record(min(self.pos, self.buffer.count - 1))
+        if ttype != Token.EOF:
+            self.pos += 1
+        t = CommonToken(CommonToken.EMPTY_SOURCE, ttype, channel, start, stop)
+        t.source = (self, self.text)
+        t.line = line
+        t.column = column
+        return t
+
+    def getSourceName(self):
+        return self.text.name
+
+
+class SharedText:
+    """The source text of a SharedTokenBuffer, as much of an InputStream as tokens use."""
+
+    def __init__(self, buffer: SharedTokenBuffer):
+        self.buffer = buffer
+        self.name = '<shared:' + buffer.name + '>'
+
+    @property
+    def size(self):
+        return self.buffer.text_length
+
+    def getText(self, start: int, stop: int):
+        return self.buffer.text(start, stop)
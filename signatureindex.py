@@ -0,0 +1,157 @@
+"""
+The signatureindex module maintains a project-wide index of the function
+signatures defined across many Nimble source files, so that a single file can
+be analyzed against functions defined elsewhere without parsing them.
+
+The index is built by a lightweight first pass that lexes each file and reads
+only the top-level `func` headers (see the outline module); function bodies are
+skipped by brace matching and never parsed. The index can be saved to and
+loaded from a JSON file, and files are re-scanned only when their modification
+time changes.
+
+Typical use:
+
+    index = SignatureIndex.load('signatures.json')  # or SignatureIndex()
+    index.add_files(paths)
+    index.save('signatures.json')
+    analyzer = InferTypesAndCheckConstraints(errors, {}, index.scope(exclude_path=path))
+"""
+
+import json
+import os
+from dataclasses import dataclass
+
+from antlr4 import FileStream
+from outline import scan_file
+from symboltable import PrimitiveType, FunctionType, Scope
+
+@dataclass(frozen=True)
+class SignatureRecord:
+    """A function signature, with the file and line on which it is defined."""
+    name: str
+    function_type: FunctionType
+    path: str
+    line: int
+
+
+def scan_signatures(source_or_path, path=None, from_file=False):
+    """
+    Returns a SignatureRecord for each well-formed top-level function header in the
+    source or source file, using the header-only scan of the outline module.
+    """
+    functions = scan_file(source_or_path, from_file).functions
+    return [SignatureRecord(f.name, f.function_type, path, f.line) for f in functions]
+
+
+class SignatureIndex:
+    """
+    An index from function name to SignatureRecord, across any number of files.
+    If two files define the same name, the most recently scanned one is indexed;
+    the other's is kept, and indexed again if that file is removed.
+    """
+
+    def __init__(self):
+        self.signatures = {}
+        self.definitions = {}  # name -> {path: SignatureRecord}, in the order scanned
+        self.files = {}  # path -> (modification time, names defined in that file)
+
+    def add_file(self, path: str) -> bool:
+        """
+        Scans the file's function headers into the index, unless the file is
+        unchanged since it was last scanned. Returns True if the file was scanned.
+        """
+        mtime = os.path.getmtime(path)
+        known = self.files.get(path)
+        if known is not None and known[0] == mtime:
+            return False
+        self.add_source(FileStream(path).strdata, path, mtime)
+        return True
+
+    def add_files(self, paths) -> int:
+        """Scans each of the given files as necessary; returns the number scanned."""
+        return sum(self.add_file(path) for path in paths)
+
+    def add_source(self, source: str, path: str, mtime: float = None):
+        """Scans the source, replacing any signatures previously indexed for `path`."""
+        self.remove(path)
+        records = scan_signatures(source, path)
+        for record in records:
+            self._define(record)
+        self.files[path] = (mtime, [record.name for record in records])
+
+    def remove(self, path: str):
+        """Removes all signatures indexed for `path`."""
+        _, names = self.files.pop(path, (None, []))
+        for name in names:
+            definitions = self.definitions.get(name, {})
+            if definitions.pop(path, None) is None:
+                continue
+            if definitions:
+                self.signatures[name] = next(reversed(definitions.values()))
+            else:
+                del self.definitions[name]
+                del self.signatures[name]
+
+    def _define(self, record: SignatureRecord):
+        self.definitions.setdefault(record.name, {})[record.path] = record
+        self.signatures[record.name] = record
+
+    def lookup(self, name: str):
+        """The SignatureRecord for `name`, or None."""
+        return self.signatures.get(name)
+
+    def scope(self, exclude_path: str = None) -> Scope:
+        """
+        Returns a Scope defining every indexed function, except those from `exclude_path`
+        (typically the file being analyzed, whose own definitions take precedence); a name
+        that file shares with others is defined as the most recently scanned other file has it.
+        It is intended as the enclosing scope of an analyzer's global scope.
+        """
+        scope = Scope('$project')
+        for name, definitions in self.definitions.items():
+            for path, record in reversed(definitions.items()):
+                if path != exclude_path:
+                    scope.define(name, record.function_type)
+                    break
+        return scope
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def __contains__(self, name):
+        return name in self.signatures
+
+    # --------------------------------------------------------
+    # Persistence
+    # --------------------------------------------------------
+
+    def save(self, index_path: str):
+        data = {
+            'files': {path: {'mtime': mtime, 'names': names}
+                      for path, (mtime, names) in self.files.items()},
+            'signatures': [
+                {'name': r.name, 'path': r.path, 'line': r.line,
+                 'parameters': [t.name for t in r.function_type.parameter_types],
+                 'returns': r.function_type.return_type.name}
+                for definitions in self.definitions.values() for r in definitions.values()
+            ],
+        }
+        with open(index_path, 'w') as file:
+            json.dump(data, file, indent=1)
+
+    @classmethod
+    def load(cls, index_path: str):
+        """Loads a saved index; returns an empty index if the file doesn't exist."""
+        index = cls()
+        if not os.path.exists(index_path):
+            return index
+        with open(index_path) as file:
+            data = json.load(file)
+        for path, entry in data['files'].items():
+            index.files[path] = (entry['mtime'], entry['names'])
+        for entry in data['signatures']:
+            function_type = FunctionType(tuple(PrimitiveType[t] for t in entry['parameters']),
+                                         PrimitiveType[entry['returns']])
+            index._define(SignatureRecord(entry['name'], function_type,
+                                          entry['path'], entry['line']))
+        return index
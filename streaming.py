@@ -0,0 +1,104 @@
+"""
+The streaming module type-checks a Nimble script while it is being parsed, one
+top-level declaration or statement of `main` at a time, so that the analysis
+of a huge generated script needs memory for only one statement of its body,
+not for its whole parse tree.
+
+`analyze_streaming` parses from an UnbufferedTokenStream, with a
+`StreamingAnalyzer` as parse listener. Within main, the analyzer passes each
+rule entry and exit on to InferTypesAndCheckConstraints as the parser makes
+it, so types are inferred bottom-up as each expression is completed and the
+tree is never walked again. As each `varDec` and `statement` of main is
+completed, any errors logged for it are detached and it is removed from the
+tree. Function definitions are kept until main is entered, since calls may
+precede definitions, and are walked then. The result is the same as that of
+parallel.analyze.
+"""
+
+from antlr4 import FileStream, InputStream, ParseTreeListener, ParseTreeWalker, \
+    UnbufferedTokenStream
+from errorlog import ErrorLog
+from generic_parser import SyntaxErrors, SyntaxErrorLog
+from nimble import NimbleLexer, NimbleParser
+from nimblesemantics import InferTypesAndCheckConstraints
+
+
+def analyze_streaming(source_or_path, from_file=False):
+    """
+    Semantic analysis of a complete script as it is parsed, discarding each statement
+    of main once checked. Returns the error log, holding only detached entries, and
+    the variables of main. Raises SyntaxErrors, without a parse tree, if the script
+    doesn't parse; no semantic errors are reported then.
+    """
+    if from_file:
+        character_stream = FileStream(source_or_path)
+    else:
+        character_stream = InputStream(source_or_path)
+    lexer = NimbleLexer(character_stream)
+    parser = NimbleParser(UnbufferedTokenStream(lexer))
+
+    lexer.removeErrorListeners()
+    parser.removeErrorListeners()
+    syntax_errors = SyntaxErrorLog()
+    lexer.addErrorListener(syntax_errors)
+    parser.addErrorListener(syntax_errors)
+
+    analyzer = StreamingAnalyzer(syntax_errors)
+    parser.addParseListener(analyzer)
+    parser.script()
+
+    if syntax_errors.has_errors():
+        raise SyntaxErrors(syntax_errors, None)
+    return analyzer.errors, analyzer.variables
+
+
+class StreamingAnalyzer(ParseTreeListener):
+    """
+    A parse listener that checks each funcDef on entry to main, and then checks main
+    inline: each rule event within main is passed on to the checker as it happens.
+    Each varDec and statement of main is pruned from the tree once complete. Checking
+    stops at the first syntax error logged in `syntax_errors`, since the tree may
+    then be incomplete, but pruning continues.
+    """
+
+    def __init__(self, syntax_errors: SyntaxErrorLog):
+        self.syntax_errors = syntax_errors
+        self.errors = ErrorLog()
+        self.variables = {}
+        self.checker = InferTypesAndCheckConstraints(ErrorLog(), self.variables)
+        self.checking = False
+
+    def enterMain(self, ctx: NimbleParser.MainContext):
+        if self.syntax_errors.has_errors():
+            return
+        script = ctx.parentCtx
+        self.checker.enterScript(script)
+        walker = ParseTreeWalker()
+        for func_def in script.funcDef():
+            walker.walk(self.checker, func_def)
+        self.detach_errors()
+        self.checking = True
+
+    def enterEveryRule(self, ctx):
+        if self.checking and not self.syntax_errors.has_errors():
+            ctx.enterRule(self.checker)
+
+    def exitEveryRule(self, ctx):
+        if self.checking and not self.syntax_errors.has_errors():
+            ctx.exitRule(self.checker)
+        if isinstance(ctx, (NimbleParser.VarDecContext, NimbleParser.StatementContext)) \
+                and in_main(ctx.parentCtx):
+            self.detach_errors()
+            ctx.parentCtx.removeLastChild()
+
+    def detach_errors(self):
+        """Moves the entries logged by the checker to `errors`, releasing their parse trees."""
+        for entry in self.checker.error_log.entries():
+            self.errors.add_entry(entry.detach())
+        self.checker.error_log = ErrorLog()
+
+
+def in_main(ctx):
+    """True if ctx is the varBlock or block of main's body."""
+    body = ctx.parentCtx
+    return isinstance(body, NimbleParser.BodyContext) and isinstance(body.parentCtx, NimbleParser.MainContext)
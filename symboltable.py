@@ -1,20 +1,139 @@
 """
+The symboltable module defines the types of the Nimble language, and the
+scopes in which names are bound to those types.
+
+Scopes form a chain: a single global scope holds the function signatures
+for a script, and each function body (and `main`) gets a child scope holding
+its parameters and local variables. Every name defined in a scope is given a
+slot index, in order of definition, so that later stages can refer to a local
+by number rather than by name.
+
+A SymbolTable numbers the distinct names of one compilation. When the lexer
+interns identifiers into it (see the interning module), every occurrence of a
+name shares the table's one copy of it.
+
 Author: Greg Phillips
 
 Version: 2022-02-04
 """
 
+from dataclasses import dataclass
 from enum import Enum, auto
 
 
 class PrimitiveType(Enum):
     """
     The primitive types defined for the Nimble language, plus the error type.
+    Void is the return type of functions that don't declare one.
     """
     Int = auto()
     Bool = auto()
     String = auto()
+    Void = auto()
     ERROR = auto()
 
     def __str__(self):
         return self.name
+
+
+@dataclass(frozen=True)
+class FunctionType:
+    """
+    The signature of a Nimble function: the types of its parameters, in
+    order, and its return type (PrimitiveType.Void if none is declared).
+    """
+    parameter_types: tuple
+    return_type: PrimitiveType
+
+    def __str__(self):
+        parameters = ', '.join(str(t) for t in self.parameter_types)
+        return f'({parameters}) -> {self.return_type}'
+
+
+class Scope:
+    """
+    A single level of name binding. Each scope maps names to types in
+    `self.types`, and names to slot indices in `self.slots`. Lookups within a
+    scope are dictionary lookups; `resolve` walks outward through the enclosing
+    scopes, of which there are never more than two in Nimble (function or main,
+    then global), so resolution is constant time regardless of program size.
+
+    An existing dictionary of name to type may be supplied as `types`, in which
+    case the scope uses (and updates) that dictionary directly.
+    """
+
+    def __init__(self, name: str, enclosing_scope=None, return_type: PrimitiveType = None,
+                 types: dict = None):
+        self.name = name
+        self.enclosing_scope = enclosing_scope
+        self.return_type = return_type
+        self.types = {} if types is None else types
+        self.slots = {symbol: index for index, symbol in enumerate(self.types)}
+
+    def define(self, name: str, symbol_type) -> int:
+        """
+        Binds `name` to `symbol_type` in this scope and returns its slot index.
+        Redefining a name keeps its original slot.
+        """
+        slot = self.slots.get(name)
+        if slot is None:
+            slot = len(self.slots)
+            self.slots[name] = slot
+        self.types[name] = symbol_type
+        return slot
+
+    def resolve_locally(self, name: str):
+        """The type bound to `name` in this scope only, or None."""
+        return self.types.get(name)
+
+    def resolve(self, name: str):
+        """The type bound to `name` in this scope or the nearest enclosing one, or None."""
+        scope = self
+        while scope is not None:
+            symbol_type = scope.types.get(name)
+            if symbol_type is not None:
+                return symbol_type
+            scope = scope.enclosing_scope
+        return None
+
+    def slot(self, name: str) -> int:
+        """The slot index of `name` in this scope, or None if not defined here."""
+        return self.slots.get(name)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, name):
+        return name in self.types
+
+    def __repr__(self):
+        return f'Scope({self.name}, {self.types})'
+
+
+class SymbolTable:
+    """
+    Interns names into dense integer symbol ids, numbered from 0 in order of first
+    appearance, for one compilation. Each name is stored once, and an id's name is
+    found by indexing: `symbols[symbol_id]`.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def intern(self, name: str) -> int:
+        """The symbol id of `name`, allocating the next one if it is new."""
+        symbol_id = self.ids.get(name)
+        if symbol_id is None:
+            symbol_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return symbol_id
+
+    def __getitem__(self, symbol_id: int) -> str:
+        return self.names[symbol_id]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
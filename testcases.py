@@ -15,10 +15,40 @@ Version: 28/02/2022
 Instructor's version: 2022-02-04
 """
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import json
+import os
+import tempfile
 import unittest
 
-from errorlog import Category
-from symboltable import PrimitiveType
+from antlr4 import CommonTokenStream, InputStream, ParseTreeWalker, Token, UnbufferedTokenStream
+from antlr4.PredictionContext import PredictionContext, PredictionContextCache, SingletonPredictionContext
+from antlr4.atn.ATNConfig import ATNConfig
+from antlr4.atn.ATNConfigSet import ATNConfigSet
+from antlr4.atn.LexerATNSimulator import LexerATNSimulator
+from antlr4.atn.ParserATNSimulator import ParserATNSimulator
+from antlr4.atn.SemanticContext import Predicate
+from antlr4.dfa.DFA import DFA
+from antlr4.error.ErrorListener import ErrorListener
+from benchmarks import CORPORA
+from chunkedlexer import lex_in_parallel
+from errorlog import Category, ErrorLog
+from exprparser import PrecedenceClimbingParser
+from generic_parser import parse, SyntaxErrors
+from instrumentation import MetricsRecorder, instrumented
+from lineindex import LineIndex
+import instrumentation
+from outline import scan_file, scan_outline
+from parallel import analyze, analyze_in_parallel, parse_in_parallel
+from profiling import profile_parse, profile_by_rule
+from predictioncache import cache_usage, clear_caches, limit_caches
+from scanninglexer import ScanningLexer, OffsetScanningLexer
+from streaming import analyze_streaming
+from nimble import NimbleLexer, NimbleParser
+from sharedtokens import SharedTokenBuffer, SharedTokenSource, lex_to_shared
+from signatureindex import SignatureIndex, scan_signatures
+from nimblesemantics import InferTypesAndCheckConstraints
+from symboltable import FunctionType, PrimitiveType, SymbolTable
 from testhelpers import do_semantic_analysis, pretty_types, do_semantic_analysis_initial_condition
 
 VALID_EXPRESSIONS = [
@@ -132,6 +162,30 @@ VARASSIGN_TESTS_invalid = [
 
 ]
 
+FUNCTION_TESTS_valid = [
+    # Each entry is a complete script which should produce no errors
+    "func f(a : Int, b : Int) -> Int { return a + b }\n var x : Int = f(1, 2)",
+    "func g() { print \"g\" }\n g()",
+    # calls may precede definitions
+    "func even(n : Int) -> Bool { return !odd(n) }\n"
+    "func odd(n : Int) -> Bool { return n == 1 }\n print even(4)",
+    # parameters and locals are scoped to their function
+    "func h(x : String) -> String { var y : String = x return y }\n var x : Int = 3",
+]
+
+FUNCTION_TESTS_invalid = [
+    # Each entry is a pair: (script source, expected error category)
+    ("func f(a : Int) -> Int { return a }\n var x : Int = f(true)", Category.INVALID_CALL),
+    ("func f(a : Int) -> Int { return a }\n var x : Int = f(1, 2)", Category.INVALID_CALL),
+    ("func f(a : Int) -> Int { return true }", Category.INVALID_RETURN),
+    ("func f() { return 1 }", Category.INVALID_RETURN),
+    ("func f() { }\n func f() { }", Category.DUPLICATE_NAME),
+    ("func f(a : Int, a : Bool) { }", Category.DUPLICATE_NAME),
+    ("var x : Int = g()", Category.UNDEFINED_NAME),
+    ("func f(a : Int) { }\n print a", Category.UNDEFINED_NAME),
+    ("func f() { }\n print f()", Category.UNPRINTABLE_EXPRESSION),
+]
+
 
 def print_debug_info(source, inferred_types, log):
     """
@@ -233,3 +287,682 @@ class TypeTests(unittest.TestCase):
 
         log, variables, inferred_types = do_semantic_analysis("while true { }", 'main')
         self.assertEqual(0, log.total_entries())
+
+    def test_functions(self):
+        """
+        Verifies that each valid script in FUNCTION_TESTS_valid has no errors, and that
+        each invalid script in FUNCTION_TESTS_invalid logs an error of the expected category.
+        """
+        for script in FUNCTION_TESTS_valid:
+            log, variables, inferred_types = do_semantic_analysis(script, 'script')
+            with self.subTest(script=script):
+                self.assertEqual(0, log.total_entries(), str(log))
+
+        for script, expected_category in FUNCTION_TESTS_invalid:
+            log, variables, inferred_types = do_semantic_analysis(script, 'script')
+            with self.subTest(script=script, expected_category=expected_category):
+                self.assertTrue(any(log.includes_on_line(expected_category, line)
+                                    for line in (1, 2)), str(log))
+
+
+class SignatureIndexTests(unittest.TestCase):
+
+    def test_cross_file_calls(self):
+        """
+        Indexes a library file, saves and reloads the index, and verifies that calls
+        to the library's functions from another script are checked against it.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            library = os.path.join(directory, 'library.nimble')
+            with open(library, 'w') as file:
+                file.write('func square(n : Int) -> Int { return n * n }\n'
+                           'func shout(s : String) { if true { print s } }\n')
+            index_path = os.path.join(directory, 'index.json')
+            index = SignatureIndex()
+            self.assertEqual(1, index.add_files([library]))
+            index.save(index_path)
+
+            index = SignatureIndex.load(index_path)
+            self.assertEqual(0, index.add_files([library]))  # unchanged, not rescanned
+            self.assertEqual(2, len(index))
+
+            log, variables, inferred_types = do_semantic_analysis(
+                'var x : Int = square(3)\nshout("hi")', 'script', index.scope())
+            self.assertEqual(0, log.total_entries(), str(log))
+
+            log, variables, inferred_types = do_semantic_analysis(
+                'var x : Int = square("3")', 'script', index.scope())
+            self.assertTrue(log.includes_on_line(Category.INVALID_CALL, 1))
+
+            log, variables, inferred_types = do_semantic_analysis(
+                'var x : Int = square(3)', 'script', index.scope(exclude_path=library))
+            self.assertTrue(log.includes_on_line(Category.UNDEFINED_NAME, 1))
+
+    def test_malformed_headers(self):
+        """
+        Verifies that a malformed function header is skipped, and the well-formed
+        headers that follow it are still indexed.
+        """
+        sources = {
+            'func f( { }\nfunc g() -> Int { return 1 }\nfunc h(a : Int) { }\nprint 1': ['g', 'h'],
+            'func f() { }\nfunc g(x) { }\nfunc h(a : Int) { }\nprint 1': ['f', 'h'],
+            'func f(a : Int { if a > 0 { print a } }\nfunc g() { }\nprint 1': ['g'],
+        }
+        for source, names in sources.items():
+            with self.subTest(source=source):
+                self.assertEqual(names, [record.name for record in scan_signatures(source)])
+
+    def test_same_name_in_two_files(self):
+        """
+        Verifies that when two files define the same function, the most recently scanned
+        definition is indexed, and removing its file indexes the other one again.
+        """
+        int_to_int = FunctionType((PrimitiveType.Int,), PrimitiveType.Int)
+        string_to_void = FunctionType((PrimitiveType.String,), PrimitiveType.Void)
+        index = SignatureIndex()
+        index.add_source('func f(n : Int) -> Int { return n }\n', 'a.nimble')
+        index.add_source('func g() { }\nfunc f(s : String) { print s }\n', 'b.nimble')
+        self.assertEqual(('b.nimble', 2), (index.lookup('f').path, index.lookup('f').line))
+        self.assertEqual(int_to_int, index.scope(exclude_path='b.nimble').resolve('f'))
+        with tempfile.TemporaryDirectory() as directory:
+            index.save(os.path.join(directory, 'index.json'))
+            index = SignatureIndex.load(os.path.join(directory, 'index.json'))
+        self.assertEqual('b.nimble', index.lookup('f').path)
+
+        index.remove('b.nimble')
+        self.assertEqual(('a.nimble', 1), (index.lookup('f').path, index.lookup('f').line))
+        self.assertNotIn('g', index)
+        self.assertEqual(int_to_int, index.scope().resolve('f'))
+
+        index.add_source('func f(s : String) { print s }\n', 'b.nimble')
+        index.remove('a.nimble')
+        self.assertEqual(string_to_void, index.scope().resolve('f'))
+        index.remove('b.nimble')
+        self.assertEqual(0, len(index))
+        self.assertIsNone(index.scope().resolve('f'))
+
+
+class OutlineTests(unittest.TestCase):
+
+    def test_outline(self):
+        """
+        Verifies that the header-only scan finds each function, its signature and
+        the extent of its body, and where main begins.
+        """
+        script = ('func f(a : Int, b : Bool) -> Int { if b { return a } return 0 }\n'
+                  'func g() { while true { print "}" } }\n'
+                  'var x : Int = f(1, true)')
+        tokens = CommonTokenStream(NimbleLexer(InputStream(script)))
+        outline = scan_outline(tokens)
+        self.assertTrue(outline.is_complete())
+        self.assertEqual(['f', 'g'], [h.name for h in outline.functions])
+        self.assertEqual(('a', 'b'), outline.functions[0].parameter_names)
+        self.assertEqual('(Int, Bool) -> Int', str(outline.functions[0].function_type))
+        self.assertEqual('() -> Void', str(outline.functions[1].function_type))
+        self.assertEqual(2, outline.functions[1].line)
+        self.assertEqual('}', outline.functions[1].stop.text)
+        self.assertEqual('var', tokens.get(outline.main_start).text)
+
+    def test_outline_problems(self):
+        outline = scan_file('func f(a Int) { }\nprint 1')
+        self.assertFalse(outline.is_complete())
+        self.assertEqual(1, outline.problems[0][0])
+
+
+class ParallelAnalysisTests(unittest.TestCase):
+
+    def test_parallel_matches_sequential(self):
+        """
+        Verifies that checking function bodies in worker processes gives the same
+        errors, in the same order, and the same main variables as a sequential walk.
+        """
+        functions = [f"func f{i}(a : Int) -> Int {{ return f{(i + 1) % 12}(a) + 1 }}" if i % 3
+                     else f"func f{i}(a : Int) -> Int {{ var b : Bool = a return b }}"
+                     for i in range(12)]
+        script = '\n'.join(functions + ['func f4() { }', 'var x : Int = f1(2)', 'print f5(true)'])
+        sequential_log, sequential_variables = analyze(script)
+        parallel_log, parallel_variables = analyze_in_parallel(script, max_workers=2)
+        self.assertEqual(str(sequential_log), str(parallel_log))
+        self.assertEqual(sequential_log.total_entries(), parallel_log.total_entries())
+        self.assertEqual(sequential_variables, parallel_variables)
+        self.assertTrue(parallel_log.includes_on_line(Category.DUPLICATE_NAME, 13))
+        self.assertTrue(parallel_log.includes_on_line(Category.INVALID_CALL, 15))
+
+    def test_parallel_parse(self):
+        """
+        Verifies that parsing functions in worker processes reassembles the same tree as
+        a sequential parse, analyzed identically, and reports the same syntax errors.
+        """
+        sources = [CORPORA['many_functions'](8),
+                   'func f(a : Int) -> Int { return g(a) }\nfunc g() { return\n f(1) }\n'
+                   'func h() -> Bool { var x : Int\n if !(1 < 2 * x) { return true } else { } return 1 }\n'
+                   'print h() + 1']
+        for source in sources:
+            with self.subTest(source=source[:40]):
+                sequential = parse(source, 'script', NimbleLexer, NimbleParser)
+                reassembled = parse_in_parallel(source, max_workers=2)
+                self.assertEqual(sequential.toStringTree(recog=sequential.parser),
+                                 reassembled.toStringTree(recog=reassembled.parser))
+                token_stream = reassembled.parser.getTokenStream()
+                for func_def in reassembled.funcDef():
+                    self.assertIs(token_stream.get(func_def.ID().symbol.tokenIndex), func_def.ID().symbol)
+                logs = []
+                for tree in (sequential, reassembled):
+                    log = ErrorLog()
+                    ParseTreeWalker().walk(InferTypesAndCheckConstraints(log, {}), tree)
+                    logs.append(str(log))
+                self.assertEqual(logs[0], logs[1])
+
+        for source in ('func f() { }\nfunc g() { print }\nprint 1', 'func f() { }\nfunc g() { }\nprint (1',
+                       'func f() { }\nfunc g() { }\n}func h() { }\n'):
+            with self.subTest(source=source):
+                with self.assertRaises(SyntaxErrors) as sequential:
+                    parse(source, 'script', NimbleLexer, NimbleParser)
+                with self.assertRaises(SyntaxErrors) as parallel:
+                    parse_in_parallel(source, max_workers=2)
+                self.assertEqual(repr(sequential.exception), repr(parallel.exception))
+
+
+class StreamingAnalysisTests(unittest.TestCase):
+
+    def test_streaming_matches_sequential(self):
+        """
+        Verifies that checking main inline, a statement at a time, while parsing gives
+        the same errors, variables and syntax errors as analyzing the complete tree.
+        """
+        sources = ['func f(a : Int) -> Int { return g(a) }\nfunc g(b : Int) -> Int { return b }\n'
+                   'var x : Int = f(1)\nvar w : Int = x + ""\nvar x : Bool\n'
+                   'x = "s"\nprint y\nreturn 3\nif 1 { print h() }',
+                   'func f() { }\nfunc f() -> Int { return "" }\nprint f()',
+                   'var x : Int = = 3\nprint x\nprint q',
+                   'var b : Bool = !(1 < 2) == true\nprint (1 + b) * -"s" + f(b, 2 * 3 - 4 / 5)',
+                   CORPORA['long_statement_list'](20)]
+        for source in sources:
+            with self.subTest(source=source[:40]):
+                try:
+                    log, variables = analyze(source)
+                    expected = [repr(entry) for entry in log.entries()], variables
+                except SyntaxErrors as e:
+                    expected = repr(e.error_log)
+                try:
+                    log, variables = analyze_streaming(source)
+                    actual = [repr(entry) for entry in log.entries()], variables
+                    self.assertFalse(any(hasattr(entry, 'ctx') for entry in log.entries()))
+                except SyntaxErrors as e:
+                    self.assertIsNone(e.parse_tree)
+                    actual = repr(e.error_log)
+                self.assertEqual(expected, actual)
+
+
+class ExpressionParserTests(unittest.TestCase):
+
+    def test_precedence_climbing_matches_generated(self):
+        """
+        Verifies that the precedence-climbing expression parser builds the same trees,
+        and reports the same syntax errors, as the generated parser.
+        """
+        scripts = [
+            'print -a * b - c < d == e',
+            'var x : Int = 1 + (2 * (3 - 4)) / -5 + f(!b, "s" + t)',
+            'x = 1 - - 2 * 3 <= 4 < 5',
+            'print 1 + * 2',
+            'x = (1 + 2',
+            'print f(1, , 2)',
+            'print a +',
+        ]
+        for script in scripts:
+            with self.subTest(script=script):
+                results = []
+                for parser_class in (NimbleParser, PrecedenceClimbingParser):
+                    try:
+                        tree, errors = parse(script, 'script', NimbleLexer, parser_class), ''
+                    except SyntaxErrors as e:
+                        tree, errors = e.parse_tree, repr(e.error_log)
+                    results.append((tree.toStringTree(recog=tree.parser), errors))
+                self.assertEqual(results[0], results[1])
+
+
+class LexerTests(unittest.TestCase):
+
+    def test_non_ascii_dfa_edges(self):
+        """
+        Verifies that the lexer DFA caches edges for non-ASCII characters, and that
+        lexing with them matches lexing by ATN simulation.
+        """
+        source = '// Grüße, 世界 🙂\nvar s : String = "u" // ½ café\nprint s'
+
+        def lex():
+            lexer = NimbleLexer(InputStream(source))
+            lexer.removeErrorListeners()
+            return [(t.type, t.text, t.line, t.column) for t in lexer.getAllTokens()]
+
+        clear_caches()
+        LexerATNSimulator.MAX_SPARSE_EDGES = 0
+        try:
+            by_atn = lex()
+        finally:
+            LexerATNSimulator.MAX_SPARSE_EDGES = 4096
+        clear_caches()
+        self.assertEqual(by_atn, lex())
+        self.assertEqual(by_atn, lex())
+        sparse = [state.sparseEdges for state in NimbleLexer.decisionsToDFA[0].states if state.sparseEdges]
+        self.assertTrue(any(ord('世') in edges for edges in sparse))
+        self.assertIn((NimbleLexer.STRING, '"u"', 2, 17), by_atn)
+
+    def test_scanning_lexer(self):
+        """
+        Verifies that the scanning lexer produces the same tokens and errors as the
+        generated lexer, including for strings and comments it leaves to the generated lexer.
+        """
+        sources = ['var s : String = "a \\"quoted\\" \\t string" // a comment',
+                   '"unterminated\nprint 1', '"bad \\q escape"', '"ü"', 'print 6 / 3 //',
+                   CORPORA['huge_strings'](2), CORPORA['unicode_comments'](2)]
+        try:
+            for elide_skipped in (True, False):
+                ScanningLexer.elideSkipped = elide_skipped
+                for source in sources:
+                    with self.subTest(source=source[:40], elide_skipped=elide_skipped):
+                        self.assertEqual(lex_with_errors(NimbleLexer, source),
+                                         lex_with_errors(ScanningLexer, source))
+        finally:
+            ScanningLexer.elideSkipped = True
+
+    def test_skipped_input_metrics(self):
+        """Verifies that the time and characters skipped by the scanning lexer are reported."""
+        recorder = MetricsRecorder()
+        with instrumented(recorder):
+            parse('  // one\nprint 1 // two\n\n', 'script', ScanningLexer, NimbleParser)
+        metrics = recorder.files[0]
+        self.assertIn('lex_skipped', metrics.phases)
+        self.assertEqual(19, metrics.counters['skipped_chars'])
+
+    def test_lazy_positions(self):
+        """
+        Verifies that tokens from a lexer that doesn't track positions resolve the
+        same lines and columns, including in lexer and parser error reports.
+        """
+        sources = ['var x : Int = 1\n  print x // c\n', '"abc" @ #\n  $ x', '"unterminated\nprint 1',
+                   'print (1 +\n)', CORPORA['many_functions'](2)]
+        for source in sources:
+            with self.subTest(source=source[:40]):
+                self.assertEqual(lex_with_errors(NimbleLexer, source), lex_with_errors(OffsetScanningLexer, source))
+                self.assertEqual(syntax_errors(NimbleLexer, source), syntax_errors(OffsetScanningLexer, source))
+
+        index = LineIndex('ab\ncd\n\ne', first_line=3, first_column=4)
+        self.assertEqual([(3, 4), (3, 6), (4, 0), (4, 2), (5, 0), (6, 0), (6, 1)],
+                         [index.position(offset) for offset in (0, 2, 3, 5, 6, 7, 8)])
+
+    def test_chunked_lexing(self):
+        """
+        Verifies that lexing a source in chunks in worker processes gives the same
+        tokens, token indices and errors as lexing it whole, however it is split.
+        """
+        sources = ['print "abc\n  # x\n\n"unterminated\r\nvar x : Int = 1 // c\n\n  print x\n', '',
+                   CORPORA['many_functions'](3), CORPORA['unicode_comments'](2)]
+        for source in sources:
+            for min_chunk_size in (1, 20, len(source) + 1):
+                with self.subTest(source=source[:40], min_chunk_size=min_chunk_size):
+                    token_stream, errors = lex_in_parallel(source, max_workers=2, min_chunk_size=min_chunk_size)
+                    token_stream.fill()
+                    self.assertEqual(lex_with_errors(NimbleLexer, source),
+                                     ([(t.type, t.text, t.start, t.stop, t.line, t.column)
+                                       for t in token_stream.tokens], errors))
+                    self.assertEqual(list(range(len(token_stream.tokens))),
+                                     [t.tokenIndex for t in token_stream.tokens])
+
+
+def lex_with_errors(lexer_class, source):
+    """The tokens (including EOF) and error messages from lexing the source."""
+    lexer = lexer_class(InputStream(source))
+    errors = []
+    lexer.removeErrorListeners()
+    lexer.addErrorListener(CollectingErrorListener(errors))
+    tokens = [lexer.nextToken()]
+    while tokens[-1].type != Token.EOF:
+        tokens.append(lexer.nextToken())
+    return [(t.type, t.text, t.start, t.stop, t.line, t.column) for t in tokens], errors
+
+
+def syntax_errors(lexer_class, source):
+    """The line, column and message of each syntax error from parsing the source at line 5, column 3."""
+    try:
+        parse(source, 'script', lexer_class, NimbleParser, line=5, column=3)
+        return []
+    except SyntaxErrors as e:
+        return [(error.line, error.column, error.message) for error in e.error_log.syntax_errors]
+
+
+class CollectingErrorListener(ErrorListener):
+
+    def __init__(self, errors):
+        self.errors = errors
+
+    def syntaxError(self, recognizer, offendingSymbol, line, column, msg, e):
+        self.errors.append((line, column, msg))
+
+
+class ParseTreeTests(unittest.TestCase):
+
+    def test_indexed_child_accessors(self):
+        """Verifies that the typed child accessors see changes to a context's children."""
+        tree = parse('var x : Int = 1 * 2', 'varDec', NimbleLexer, NimbleParser)
+        product = tree.expr()
+        self.assertEqual(['1', '2'], [e.getText() for e in product.getTypedRuleContexts(NimbleParser.ExprContext)])
+        self.assertIsNone(product.expr(2))
+        self.assertIsNone(product.expr(-1))
+        self.assertEqual('x', tree.ID().getText())
+        self.assertEqual([], tree.getTokens(NimbleParser.STRING))
+
+        product.removeLastChild()
+        self.assertIsNone(product.expr(1))
+        product.addChild(tree.expr().expr(0))
+        self.assertEqual('1', product.expr(1).getText())
+        tree.addTokenNode(tree.ID().symbol)
+        self.assertEqual(2, len(tree.getTokens(NimbleParser.ID)))
+
+    def test_token_text(self):
+        """Verifies that token text is sliced from the source once, and can still be replaced."""
+        tree = parse('var total : Int = 1', 'varDec', NimbleLexer, NimbleParser)
+        token = tree.ID().symbol
+        self.assertEqual('total', token.text)
+        self.assertIs(token.text, token.text)
+        token.text = 'sum'
+        self.assertEqual('sum', tree.ID().getText())
+        self.assertEqual('<EOF>', parse('', 'script', NimbleLexer, NimbleParser).EOF().getText())
+
+
+class TokenStreamTests(unittest.TestCase):
+
+    def test_unbuffered_token_stream(self):
+        """
+        Verifies that parsing from an unbuffered token stream gives the same trees and
+        syntax errors as from a CommonTokenStream, while keeping only a few tokens.
+        """
+        sources = ['func f(a : Int) -> Int {\n return f(a)\n}\nvar x : Int = f(1) * 2\nprint x',
+                   'print (1', 'var x : Int = = 3\nprint x', 'if 1 < { }', 'return f(1,)',
+                   CORPORA['many_functions'](3)]
+        for source in sources:
+            with self.subTest(source=source[:40]):
+                self.assertEqual(parse_from_stream(CommonTokenStream, source)[:2],
+                                 parse_from_stream(UnbufferedTokenStream, source)[:2])
+
+        _, _, token_stream = parse_from_stream(UnbufferedTokenStream, CORPORA['long_statement_list'](50),
+                                               build_parse_trees=False)
+        self.assertEqual(Token.EOF, token_stream.LA(1))
+        self.assertGreater(token_stream.index, 500)
+        self.assertEqual(1, len(token_stream.tokens))
+
+    def test_shared_token_buffer(self):
+        """
+        Verifies that tokens lexed into shared memory, in chunks by worker processes, read
+        back as the lexer's tokens, and parse in another process to the same tree.
+        """
+        sources = ['print "abc\n  # x\n\n"unterminated\r\nvar x : Int = 1 // c\n\n  print x\n', '',
+                   '// Grüße, 世界\nprint "a" + 1', CORPORA['unicode_comments'](2), CORPORA['many_functions'](3)]
+        for source in sources:
+            for min_chunk_size in (1, len(source) + 1):
+                with self.subTest(source=source[:40], min_chunk_size=min_chunk_size):
+                    buffer, errors = lex_to_shared(source, max_workers=2, min_chunk_size=min_chunk_size)
+                    with buffer:
+                        try:
+                            token_stream = CommonTokenStream(SharedTokenSource(buffer))
+                            token_stream.fill()
+                            self.assertEqual(lex_with_errors(NimbleLexer, source),
+                                             ([(t.type, t.text, t.start, t.stop, t.line, t.column)
+                                               for t in token_stream.tokens], errors))
+                            with ProcessPoolExecutor(max_workers=1) as executor:
+                                tree = executor.submit(parse_from_shared, buffer.name).result()
+                            self.assertEqual(parse_from_stream(CommonTokenStream, source)[0], tree)
+                        finally:
+                            buffer.unlink()
+
+        # a buffer whose lexing fails is released, in the calling process or in workers
+        blocks = set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else set()
+        for max_workers, min_chunk_size in ((1, 100), (2, 1)):
+            with self.subTest(max_workers=max_workers):
+                with self.assertRaises(ValueError):
+                    lex_to_shared('print 1\nprint 2\n', FailingLexer, max_workers, min_chunk_size)
+        if os.path.isdir('/dev/shm'):
+            self.assertEqual(blocks, set(os.listdir('/dev/shm')))
+
+
+def parse_from_stream(token_stream_class, source, build_parse_trees=True):
+    """The parse tree as a string, the syntax errors, and the token stream from parsing the source."""
+    lexer = NimbleLexer(InputStream(source))
+    token_stream = token_stream_class(lexer)
+    parser = NimbleParser(token_stream)
+    parser.buildParseTrees = build_parse_trees
+    errors = []
+    for recognizer in (lexer, parser):
+        recognizer.removeErrorListeners()
+        recognizer.addErrorListener(CollectingErrorListener(errors))
+    tree = parser.script()
+    return tree.toStringTree(recog=parser), errors, token_stream
+
+
+class FailingLexer(NimbleLexer):
+    """A lexer that fails on its first token."""
+
+    def nextToken(self):
+        raise ValueError('lexer failed')
+
+
+def parse_from_shared(name):
+    """The parse tree as a string from parsing the tokens in the named SharedTokenBuffer."""
+    with SharedTokenBuffer.attach(name) as buffer:
+        parser = NimbleParser(CommonTokenStream(SharedTokenSource(buffer)))
+        parser.removeErrorListeners()
+        return parser.script().toStringTree(recog=parser)
+
+
+class InterningTests(unittest.TestCase):
+
+    def test_interned_identifiers(self):
+        """
+        Verifies that identifiers are interned into dense symbol ids shared by repeated
+        names, and that analysis of the interned tree matches that of a plain one.
+        """
+        source = ('func twice(n : Int) -> Int { return n * 2 }\n'
+                  'var total : Int = twice(1)\ntotal = total + count\nprint twice(total)')
+        symbols = SymbolTable()
+        tree = parse(source, 'script', NimbleLexer, NimbleParser, symbols=symbols)
+        self.assertEqual(['twice', 'n', 'total', 'count'], symbols.names)
+        identifiers = [token for token in tree.parser.getTokenStream().tokens if token.type == NimbleParser.ID]
+        self.assertEqual([0, 1, 1, 2, 0, 2, 2, 3, 0, 2], [token.symbolId for token in identifiers])
+        self.assertIs(identifiers[3].text, identifiers[5].text)
+
+        interned = InferTypesAndCheckConstraints(ErrorLog(), {})
+        ParseTreeWalker().walk(interned, tree)
+        by_name = InferTypesAndCheckConstraints(ErrorLog(), {})
+        ParseTreeWalker().walk(by_name, parse(source, 'script', NimbleLexer, NimbleParser))
+        self.assertEqual([repr(entry) for entry in by_name.error_log.entries()],
+                         [repr(entry) for entry in interned.error_log.entries()])
+        self.assertTrue(interned.error_log.includes_on_line(Category.UNDEFINED_NAME, 3))
+        self.assertEqual(by_name.variables, interned.variables)
+
+
+class PredictionTests(unittest.TestCase):
+
+    def test_ll1_decision_tables(self):
+        """
+        Verifies the LL(1) table of the statement decision, and that parsing with
+        the LL(1) fast path gives the same trees and errors as without it.
+        """
+        parser = NimbleParser(CommonTokenStream(NimbleLexer(InputStream(''))))
+        statement = parser.atn.ll1Tables[9]
+        self.assertEqual(3, statement[NimbleParser.T__11])  # 'if'
+        self.assertEqual(5, statement[NimbleParser.T__14])  # 'return'
+        self.assertEqual(0, statement[NimbleParser.ID])     # assignment or call
+        self.assertIsNone(parser.atn.ll1Tables[12])         # precedence decision
+
+        scripts = ['func f(a : Int) -> Int { return a }\nvar x : Int = f(1) if x < 2 { print x }',
+                   'var x : Int = \nprint 1', 'if x { } else print 1', 'print f(1 2)']
+        for script in scripts:
+            with self.subTest(script=script):
+                results = []
+                for fast_path in (True, False):
+                    ParserATNSimulator.ll1FastPath = fast_path
+                    try:
+                        tree, errors = parse(script, 'script', NimbleLexer, NimbleParser), ''
+                    except SyntaxErrors as e:
+                        tree, errors = e.parse_tree, repr(e.error_log)
+                    finally:
+                        ParserATNSimulator.ll1FastPath = True
+                    results.append((tree.toStringTree(recog=tree.parser), errors))
+                self.assertEqual(results[0], results[1])
+
+    def test_config_set_keys(self):
+        """
+        Verifies that a config set merges configurations differing only in their
+        prediction context, and keeps those with different semantic contexts apart.
+        """
+        state = NimbleParser.atn.states[20]
+        configs = ATNConfigSet(fullCtx=False)
+        configs.add(ATNConfig(state, 1, SingletonPredictionContext.create(PredictionContext.EMPTY, 5)))
+        configs.add(ATNConfig(state, 1, SingletonPredictionContext.create(PredictionContext.EMPTY, 7)))
+        self.assertEqual(1, len(configs))
+        self.assertEqual(2, len(configs.get(0).context))
+
+        predicated = ATNConfig(state, 1, PredictionContext.EMPTY, Predicate(9, 0, False))
+        self.assertNotIn(predicated, configs)
+        configs.add(predicated)
+        configs.add(ATNConfig(state, 2, PredictionContext.EMPTY))
+        self.assertEqual(3, len(configs))
+        self.assertIn(ATNConfig(state, 1, PredictionContext.EMPTY, Predicate(9, 0, False)), configs)
+
+    def test_profiling(self):
+        """
+        Verifies that profiling reports predictions by rule name, and that returning
+        a function call needs full-context prediction, since the call might equally
+        be the returned expression or the next statement.
+        """
+        script = 'func f(a : Int) -> Int {\n return f(a)\n}\nvar x : Int = f(1) * 2\nprint x'
+        tree, profiles = profile_parse(script)
+        self.assertEqual(0, tree.parser.getNumberOfSyntaxErrors())
+        by_decision = {p.decision: p for p in profiles}
+        self.assertEqual('statement', by_decision[8].rule)
+        self.assertEqual(1, by_decision[8].full_context_fallbacks)
+        self.assertGreaterEqual(by_decision[8].max_lookahead, 2)
+        self.assertEqual(2, by_decision[9].ll1_predictions)  # 'return' and 'print'
+        self.assertEqual({'statement', 'expr'}, set(profile_by_rule(profiles)))
+
+
+class PredictionCacheTests(unittest.TestCase):
+
+    def test_limited_caches(self):
+        """
+        Verifies that capping the shared prediction caches bounds them without
+        changing analysis results, and that clearing them empties them.
+        """
+        script = '\n'.join([f'func f{i}(a : Int) -> Int {{ return a * {i} + f{i}(a - 1) }}'
+                             for i in range(20)] + ['var x : Int = f3(1 + 2 * 3)', 'print x < 2'])
+        expected_log, expected_variables = analyze(script)
+        try:
+            clear_caches()
+            limit_caches(max_dfa_states=4, max_context_entries=3)
+            log, variables = analyze(script)
+            usage = cache_usage()
+        finally:
+            limit_caches()
+        self.assertEqual(str(expected_log), str(log))
+        self.assertEqual(expected_variables, variables)
+        self.assertLessEqual(usage.context_entries, 3)
+        self.assertGreater(usage.context_evictions, 0)
+        self.assertTrue(all(len(dfa.states) <= 4 for dfa in NimbleParser.decisionsToDFA))
+
+        analyze(script)
+        self.assertGreater(cache_usage().total_bytes, 0)
+        clear_caches()
+        usage = cache_usage()
+        self.assertEqual((0, 0, 0), (usage.dfa_states, usage.context_entries, usage.context_bytes))
+        self.assertEqual((0, 0, 0), (usage.context_hits, usage.context_misses, usage.context_evictions))
+
+
+class ThreadSafetyTests(unittest.TestCase):
+
+    def test_parsing_in_many_threads(self):
+        """
+        Parses many scripts in 16 threads at once, starting from empty shared DFAs,
+        and verifies the results match sequential parses and the shared DFAs are
+        consistent: state numbers unique, and every edge leading to a state in its DFA.
+        """
+        sources = [generate(size) for generate in CORPORA.values() for size in (1, 3, 8)]
+        sources += ['print 1 + * 2', 'x = (1 + 2', 'print "\u00e9t\u00e9" + s']
+
+        def parse_one(source):
+            try:
+                tree, errors = parse(source, 'script', NimbleLexer, NimbleParser), ''
+            except SyntaxErrors as e:
+                tree, errors = e.parse_tree, repr(e.error_log)
+            return tree.toStringTree(recog=tree.parser), errors
+
+        expected = [parse_one(source) for source in sources]
+        clear_caches()
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(parse_one, sources * 8))
+        self.assertEqual(expected * 8, results)
+
+        for recognizer in (NimbleLexer, NimbleParser):
+            for dfa in recognizer.decisionsToDFA:
+                states = dfa.states
+                self.assertEqual(len(states), len({state.stateNumber for state in states}))
+                for state in states:
+                    for target in state.edges or []:
+                        if target is not None and target.stateNumber != 0x7FFFFFFF:
+                            self.assertIs(target, states[target])
+
+    def test_lexer_dfa_discarded_mid_token(self):
+        """
+        Verifies that a token matched across a swap of its mode's DFA, as when the DFA
+        is discarded or cleared, adds its states and edges to the DFA it began with.
+        """
+        class SwappingSimulator(LexerATNSimulator):
+            def consume(self, input):
+                super().consume(input)
+                if input.index == 3:
+                    old = self.decisionToDFA[0]
+                    self.decisionToDFA[0] = DFA(old.atnStartState, old.decision)
+
+        lexer = NimbleLexer(InputStream('abcdefgh'))
+        dfas = [DFA(state, i) for i, state in enumerate(lexer.atn.decisionToState)]
+        lexer._interp = SwappingSimulator(lexer, lexer.atn, dfas, PredictionContextCache())
+        first = dfas[0]
+        self.assertEqual('abcdefgh', lexer.nextToken().text)
+        self.assertIsNot(first, dfas[0])
+        for state in first.states:
+            for target in state.edges or []:
+                if target is not None and target.stateNumber != 0x7FFFFFFF:
+                    self.assertIs(target, first.states[target])
+        self.assertEqual(0, len(dfas[0].states))
+
+
+class InstrumentationTests(unittest.TestCase):
+
+    def test_metrics(self):
+        """
+        Verifies that the pipeline reports per-phase times and counts for each file
+        while a recorder is installed, and nothing once it is removed.
+        """
+        recorder = MetricsRecorder()
+        with instrumented(recorder):
+            errors, _, _ = do_semantic_analysis('var x : Int = 1 + true\nprint x', 'script')
+            with self.assertRaises(SyntaxErrors):
+                parse('print (1', 'script', NimbleLexer, NimbleParser)
+        do_semantic_analysis('print 1', 'script')
+        self.assertIsInstance(instrumentation.current(), instrumentation.Instrumentation)
+        self.assertFalse(instrumentation.current().enabled)
+
+        self.assertEqual(2, len(recorder.files))
+        analyzed, parsed = recorder.files
+        self.assertEqual({'lex', 'parse', 'typecheck', 'walk'}, set(analyzed.phases))
+        self.assertEqual(11, analyzed.counters['tokens'])  # including EOF
+        self.assertEqual(errors.total_entries(), analyzed.counters['semantic_errors'])
+        self.assertGreater(errors.total_entries(), 0)
+        self.assertEqual(0, analyzed.counters['syntax_errors'])
+        self.assertEqual(1, parsed.counters['syntax_errors'])
+        self.assertEqual(15, recorder.totals().counters['tokens'])
+
+        self.assertEqual(2, len(json.loads(recorder.to_json())['files']))
+        prometheus = recorder.to_prometheus()
+        self.assertIn('nimble_phase_seconds{file="<source>",phase="typecheck"}', prometheus)
+        self.assertIn('nimble_tokens{file="<source>"} 11', prometheus)
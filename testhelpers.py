@@ -13,24 +13,36 @@ from collections import defaultdict
 from antlr4 import ParserRuleContext, ParseTreeWalker
 from errorlog import ErrorLog
 from generic_parser import parse
+import instrumentation
 from nimble import NimbleLexer, NimbleParser, NimbleListener
 from nimblesemantics import InferTypesAndCheckConstraints
+from symboltable import SymbolTable
 
 
-def do_semantic_analysis(source, start_rule_name):
+def do_semantic_analysis(source, start_rule_name, enclosing_scope=None):
     """
     Runs semantic analysis on the source, then runs the expression
     type collector to collect the inferred types of all expressions
     on the parse tree.
+
+    An enclosing_scope, e.g. from a signatureindex.SignatureIndex, supplies
+    functions defined outside the source.
     """
-    tree = parse(source, start_rule_name, NimbleLexer, NimbleParser)
-    errors = ErrorLog()
-    variables = {}
-    walker = ParseTreeWalker()
-    analyzer = InferTypesAndCheckConstraints(errors, variables)
-    walker.walk(analyzer, tree)
-    type_collector = ExpressionTypeCollector()
-    walker.walk(type_collector, tree)
+    hooks = instrumentation.current()
+    with hooks.file('<source>'):
+        symbols = SymbolTable()
+        tree = parse(source, start_rule_name, NimbleLexer, NimbleParser, symbols=symbols)
+        errors = ErrorLog()
+        variables = {}
+        walker = ParseTreeWalker()
+        analyzer = InferTypesAndCheckConstraints(errors, variables, enclosing_scope)
+        with hooks.phase('typecheck'):
+            walker.walk(analyzer, tree)
+        type_collector = ExpressionTypeCollector()
+        with hooks.phase('walk'):
+            walker.walk(type_collector, tree)
+        if hooks.enabled:
+            hooks.count('semantic_errors', errors.total_entries())
     return errors, variables, type_collector.inferred_types
 
 